@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Grade Processing Benchmarks
+Measures reader throughput on the grade corpus so backends can be compared, and
+runs every entry point over a fixed corpus sample against stored baselines
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+import grade_cleaner
+import process_worksheets
+from grade_file_deduplicator import FileDeduplicator
+from main import EXCEL_READERS, GradeProcessor, excel_engine_available
+
+# Corpus folders the suite samples from, and the file types taken from each
+SUITE_SOURCES = {
+    'IFL_Grades': ('data/IFL_Grades', ('.xlsx', '.xls', '.csv', '.pdf')),
+    'interim': ('data/interim', ('.csv',)),
+    'clean_csvs': ('data/clean/csvs', ('.xlsx', '.xls', '.csv')),
+}
+
+# Sampled IFL_Grades files also packed into a zip archive with no extracted
+# copy next to it, so the suite exercises reading members straight from an archive
+ZIP_SAMPLE_FILES = 10
+
+# Relative slowdown (or memory growth) beyond which a stage counts as a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def find_excel_files(input_dir: Path, limit: int | None = None) -> list[Path]:
+    """Find workbooks in a stable order, optionally thinned to an evenly spaced sample"""
+    return find_files(input_dir, ('.xlsx', '.xls'), limit)
+
+
+def find_files(input_dir: Path, suffixes: tuple[str, ...], limit: int | None = None) -> list[Path]:
+    """Find files with the given suffixes in a stable order, optionally thinned to an evenly spaced sample"""
+    files = []
+    for root, dirs, filenames in os.walk(input_dir):
+        if '__MACOSX' in Path(root).parts:
+            continue
+        for filename in filenames:
+            if filename.startswith('._'):
+                continue
+            if filename.lower().endswith(suffixes):
+                files.append(Path(root) / filename)
+    files.sort()
+
+    if limit and len(files) > limit:
+        step = len(files) / limit
+        files = [files[int(i * step)] for i in range(limit)]
+    return files
+
+
+def benchmark_excel_engine(engine: str, files: list[Path]) -> dict:
+    """Read the first sheet of every file with one backend and time it"""
+    reader = EXCEL_READERS[engine]
+
+    # Warm up so import and first-use costs are not counted
+    for filepath in files[:1]:
+        try:
+            reader(filepath)
+        except Exception:
+            pass
+
+    rows = 0
+    failed = 0
+    start = time.perf_counter()
+    for filepath in files:
+        try:
+            rows += len(reader(filepath))
+        except Exception:
+            failed += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'engine': engine,
+        'files': len(files),
+        'failed': failed,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'files_per_sec': len(files) / elapsed if elapsed else 0.0,
+    }
+
+
+def run_excel_benchmark(args):
+    input_dir = Path(args.input_dir)
+    files = find_excel_files(input_dir, args.limit)
+    print(f"Benchmarking {len(files)} Excel files from {input_dir}")
+
+    engines = args.engines or list(EXCEL_READERS)
+    results = []
+    for engine in engines:
+        if not excel_engine_available(engine):
+            print(f"Skipping {engine}: not installed")
+            continue
+        results.append(benchmark_excel_engine(engine, files))
+
+    print(f"\n{'Engine':<12}{'Files':>8}{'Failed':>8}{'Rows':>10}{'Seconds':>10}{'Rows/sec':>12}{'Files/sec':>11}")
+    print("-" * 71)
+    for r in results:
+        print(f"{r['engine']:<12}{r['files']:>8}{r['failed']:>8}{r['rows']:>10}"
+              f"{r['seconds']:>10.2f}{r['rows_per_sec']:>12.0f}{r['files_per_sec']:>11.1f}")
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak-RSS counter for this process (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB since the last reset"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def measure(entry: str, stage: str, func) -> dict:
+    """Run one stage; func returns (files, rows), rows may be None when not meaningful"""
+    per_stage_rss = reset_peak_rss()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        files, rows = func()
+        elapsed = time.perf_counter() - start
+    return {
+        'entry': entry,
+        'stage': stage,
+        'files': files,
+        'rows': rows,
+        'seconds': elapsed,
+        'files_per_sec': files / elapsed if elapsed else 0.0,
+        'rows_per_sec': rows / elapsed if rows is not None and elapsed else None,
+        # Without a resettable counter this is the peak of the whole run so far
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_per_stage': per_stage_rss,
+    }
+
+
+def build_sample(sample_dir: Path, limit: int) -> dict[str, int]:
+    """Copy an evenly spaced sample of each corpus folder into sample_dir
+
+    The sample only depends on the corpus contents and the limit, so repeated
+    runs (and the stored baseline) measure the same files.
+    """
+    counts = {}
+    for name, (source, suffixes) in SUITE_SOURCES.items():
+        source = Path(source)
+        if not source.is_dir():
+            print(f"Skipping {source}: not found")
+            continue
+        files = find_files(source, suffixes, limit)
+        for filepath in files:
+            target = sample_dir / name / filepath.relative_to(source)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(filepath, target)
+        counts[name] = len(files)
+
+    members = find_files(sample_dir / 'IFL_Grades', SUITE_SOURCES['IFL_Grades'][1], ZIP_SAMPLE_FILES)
+    if members:
+        archive = sample_dir / 'zipped' / 'grades.zip'
+        archive.parent.mkdir(parents=True)
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for filepath in members:
+                zf.write(filepath, filepath.relative_to(sample_dir))
+        counts['zipped'] = len(members)
+    return counts
+
+
+def bench_main(sample_dir: Path, work_dir: Path, args) -> list[dict]:
+    processor = GradeProcessor(sample_dir, work_dir / 'main', jobs=args.jobs)
+    files = len(processor.find_files())
+
+    def extract():
+        processor.process_all_files()
+        return files, processor.record_count
+
+    def reports():
+        processor.generate_reports()
+        return files, processor.record_count
+
+    results = [measure('main', 'extract', extract), measure('main', 'reports', reports)]
+    check_zip_members(processor)
+    return results
+
+
+def check_zip_members(processor: GradeProcessor):
+    """Fail the suite unless the sampled archive's members were read straight from the zip"""
+    members = [filepath for filepath in processor.zip_members if 'zipped' in filepath.parts]
+    failed = [filepath for filepath in members if filepath in processor.failed_files]
+    if not members or failed:
+        sys.exit(f"Zip member check failed: {len(members)} members discovered, {len(failed)} could not be read")
+    print(f"Read {len(members)} members from the sample zip archive")
+
+
+def bench_deduplicator(sample_dir: Path, work_dir: Path, args) -> list[dict]:
+    hasher = FileDeduplicator(sample_dir, work_dir / 'dedup_hash')
+    files = hasher.find_all_files()
+
+    def hash_all():
+        hasher.plan_duplicate_keys(files)
+        hasher.compute_content_hashes(files)
+        return len(files), None
+
+    def run():
+        FileDeduplicator(sample_dir, work_dir / 'dedup').process_all_files()
+        return len(files), None
+
+    # A second pass over the same files, answered from the hash cache the first pass filled
+    cache_path = work_dir / 'hash_cache.sqlite'
+    cold = FileDeduplicator(sample_dir, work_dir / 'dedup_cold', hash_cache_path=cache_path)
+    cold_files = cold.find_all_files()
+    cold.plan_duplicate_keys(cold_files)
+    cold.compute_content_hashes(cold_files)
+    cold.hash_cache.save()
+
+    def hash_cached():
+        warm = FileDeduplicator(sample_dir, work_dir / 'dedup_warm', hash_cache_path=cache_path)
+        warm_files = warm.find_all_files()
+        warm.plan_duplicate_keys(warm_files)
+        warm.compute_content_hashes(warm_files)
+        return len(files), None
+
+    return [measure('deduplicator', 'hash', hash_all), measure('deduplicator', 'hash_cached', hash_cached),
+            measure('deduplicator', 'run', run)]
+
+
+def bench_worksheets(sample_dir: Path, work_dir: Path, args) -> list[dict]:
+    output_dir = work_dir / 'worksheets'
+    files = len(list(sample_dir.rglob('*.xlsx')))
+
+    def convert():
+        process_worksheets.process_excel_files(sample_dir, output_dir)
+        return files, None
+
+    result = measure('worksheets', 'convert', convert)
+    # Rows written are counted afterwards so the count is not part of the timing
+    rows = sum(len(pd.read_csv(path)) for path in output_dir.glob('*.csv') if path.stat().st_size > 1)
+    result['rows'] = rows
+    result['rows_per_sec'] = rows / result['seconds'] if result['seconds'] else 0.0
+    return [result]
+
+
+def bench_cleaner(sample_dir: Path, work_dir: Path, args) -> list[dict]:
+    files = find_files(sample_dir, ('.csv',))
+    legacy_path = Path('data/all_ifl_to_update.csv')
+    if legacy_path.exists():
+        legacy_df = pd.read_csv(legacy_path)
+        legacy_df['student_id'] = legacy_df['student_id'].astype(str).str.strip()
+    else:
+        # Without the SIS extract the files are still parsed, but no updates are generated
+        legacy_df = pd.DataFrame(columns=['student_id', 'termid', 'classid'])
+
+    def scan():
+        for filepath in files:
+            grade_cleaner.find_data_start_and_id_column(filepath)
+        return len(files), None
+
+    def process():
+        for filepath in files:
+            grade_cleaner.process_consolidated_file(filepath, None, legacy_df)
+        return len(files), None
+
+    return [measure('grade_cleaner', 'scan', scan), measure('grade_cleaner', 'process', process)]
+
+
+# Quick invocations whose start-up (mostly import) time is measured; {tmp} is a scratch directory
+STARTUP_COMMANDS = {
+    'import_main': ['-c', 'import main'],
+    'import_deduplicator': ['-c', 'import grade_file_deduplicator'],
+    'main_help': ['main.py', '--help'],
+    'deduplicator_test': ['grade_file_deduplicator.py', '{tmp}', '{tmp}/out', '--test'],
+    # Reference point: what the heavy import alone costs
+    'import_pandas': ['-c', 'import pandas'],
+}
+
+
+def time_command(argv: list[str], repeats: int) -> float:
+    """Best wall time of a fresh interpreter running argv, over several runs
+
+    Peak RSS is not reported: Linux carries the (already large) peak of this
+    process over into children, so it would not say anything about them.
+    """
+    best_seconds = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=Path(__file__).parent,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+    return best_seconds
+
+
+def bench_startup(sample_dir: Path, work_dir: Path, args) -> list[dict]:
+    results = []
+    for stage, argv in STARTUP_COMMANDS.items():
+        argv = [arg.format(tmp=work_dir) for arg in argv]
+        seconds = time_command(argv, args.repeats)
+        results.append({
+            'entry': 'startup',
+            'stage': stage,
+            'files': 0,
+            'rows': None,
+            'seconds': seconds,
+            'files_per_sec': 0.0,
+            'rows_per_sec': None,
+            'peak_rss_mb': None,
+            'rss_per_stage': False,
+        })
+    return results
+
+
+SUITE_ENTRIES = {
+    'startup': bench_startup,
+    'main': bench_main,
+    'deduplicator': bench_deduplicator,
+    'worksheets': bench_worksheets,
+    'grade_cleaner': bench_cleaner,
+}
+
+
+def compare_to_baseline(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Print each stage against its baseline and return the stages that regressed"""
+    previous = {(r['entry'], r['stage']): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"\nAgainst baseline ({baseline.get('created', 'unknown date')}, tolerance {tolerance:.0%}):")
+    for r in results:
+        base = previous.get((r['entry'], r['stage']))
+        if base is None:
+            print(f"  {r['entry']}/{r['stage']}: no baseline")
+            continue
+        time_ratio = r['seconds'] / base['seconds'] if base['seconds'] else 1.0
+        rss_ratio = r['peak_rss_mb'] / base['peak_rss_mb'] if r['peak_rss_mb'] and base['peak_rss_mb'] else 1.0
+        flag = ''
+        if time_ratio > 1 + tolerance or rss_ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(f"{r['entry']}/{r['stage']}")
+        print(f"  {r['entry']}/{r['stage']}: time x{time_ratio:.2f}, peak RSS x{rss_ratio:.2f}{flag}")
+    return regressions
+
+
+def run_startup_benchmark(args):
+    with tempfile.TemporaryDirectory(prefix='grade_bench_') as tmp:
+        results = bench_startup(Path(tmp), Path(tmp), args)
+    print(f"{'Command':<24}{'Best seconds':>14}")
+    print("-" * 38)
+    for r in results:
+        print(f"{r['stage']:<24}{r['seconds']:>14.3f}")
+
+
+def run_suite(args):
+    entries = args.entries or list(SUITE_ENTRIES)
+    # Keep the entry points' own progress logging and parser warnings out of the measurements
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+
+    with tempfile.TemporaryDirectory(prefix='grade_bench_') as tmp:
+        sample_dir = Path(tmp) / 'sample'
+        counts = build_sample(sample_dir, args.limit)
+        print("Sample: " + ", ".join(f"{name} {count} files" for name, count in counts.items()))
+
+        results = []
+        for entry in entries:
+            work_dir = Path(tmp) / 'work' / entry
+            work_dir.mkdir(parents=True)
+            results.extend(SUITE_ENTRIES[entry](sample_dir, work_dir, args))
+
+    print(f"\n{'Entry/stage':<30}{'Files':>7}{'Rows':>9}{'Seconds':>10}{'Files/sec':>11}{'Rows/sec':>11}{'Peak MB':>9}")
+    print("-" * 87)
+    for r in results:
+        rows = '-' if r['rows'] is None else r['rows']
+        rows_per_sec = '-' if r['rows_per_sec'] is None else f"{r['rows_per_sec']:.0f}"
+        peak = '-' if r['peak_rss_mb'] is None else f"{r['peak_rss_mb']:.0f}"
+        print(f"{r['entry'] + '/' + r['stage']:<30}{r['files']:>7}{rows:>9}{r['seconds']:>10.2f}"
+              f"{r['files_per_sec']:>11.1f}{rows_per_sec:>11}{peak:>9}")
+
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'limit': args.limit,
+        'sample': counts,
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('limit') != args.limit:
+            print(f"\nBaseline was recorded with --limit {baseline.get('limit')}; results are not comparable")
+        else:
+            regressions = compare_to_baseline(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline saved to {baseline_path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Benchmark grade processing on the grade corpus')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    excel_parser = subparsers.add_parser('excel', help='Compare Excel reader backends (rows/sec)')
+    excel_parser.add_argument('input_dir', nargs='?', default='data/IFL_Grades',
+                              help='Directory containing Excel files (default: data/IFL_Grades)')
+    excel_parser.add_argument('--engines', nargs='+', choices=list(EXCEL_READERS),
+                              help='Backends to compare (default: all installed)')
+    excel_parser.add_argument('--limit', type=int, help='Benchmark an evenly spaced sample of this many files')
+    excel_parser.set_defaults(func=run_excel_benchmark)
+
+    startup_parser = subparsers.add_parser('startup', help='Measure start-up and import time of the CLIs')
+    startup_parser.add_argument('--repeats', type=int, default=5, help='Runs per command; the best is kept (default: 5)')
+    startup_parser.set_defaults(func=run_startup_benchmark)
+
+    suite_parser = subparsers.add_parser(
+        'suite', help='Run every entry point on a fixed corpus sample and compare with a stored baseline')
+    suite_parser.add_argument('--entries', nargs='+', choices=list(SUITE_ENTRIES),
+                              help='Entry points to run (default: all)')
+    suite_parser.add_argument('--limit', type=int, default=100,
+                              help='Files sampled from each corpus folder (default: 100)')
+    suite_parser.add_argument('--jobs', '-j', type=int, default=1, help='--jobs passed to main.py (default: 1)')
+    suite_parser.add_argument('--baseline', default='benchmark_baseline.json',
+                              help='Baseline file to compare against (default: benchmark_baseline.json)')
+    suite_parser.add_argument('--save-baseline', action='store_true',
+                              help='Store this run as the new baseline instead of comparing')
+    suite_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                              help='Allowed relative slowdown or memory growth before failing (default: 0.10)')
+    suite_parser.add_argument('--repeats', type=int, default=5,
+                              help='Runs per start-up command; the best is kept (default: 5)')
+    suite_parser.add_argument('--output', help='Also write the results of this run to a JSON file')
+    suite_parser.set_defaults(func=run_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,28 +4,147 @@ Grade File Deduplicator and Normalizer
 Converts all grade files to uniquely named CSVs while eliminating true duplicates
 """
 
-import pandas as pd
 import os
 import hashlib
+import io
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 from typing import Dict, Set, List
 import re
+from collections import defaultdict, deque
+
+from grade_sources import discover_files, open_source, read_source_bytes, source_size
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bytes hashed from each end of a file before deciding whether a full hash is needed
+PARTIAL_HASH_BYTES = 64 * 1024
+# Read size for full hashes; large reads keep the number of calls down on synced/network volumes
+HASH_BUFFER_BYTES = 1024 * 1024
+# Threads reading and hashing file bytes concurrently; they mostly wait on I/O, so this exceeds the CPU count
+DEFAULT_HASH_JOBS = 8
+
+# Bump whenever a hashing function changes so hash caches from older runs are discarded
+HASH_CACHE_VERSION = 1
+# Cached hashes written between commits to the cache database
+HASH_CACHE_COMMIT_EVERY = 500
+
+class HashCache:
+    """Persistent file hashes for re-runs over a mostly unchanged tree
+    
+    Rows are keyed by device and inode (plus the member name for files inside
+    zip archives) and only used while the file's size and mtime still match,
+    so a changed file is simply hashed again. Every lookup is a query against
+    SQLite; nothing is loaded into memory up front. Safe to share between
+    hashing threads.
+    """
+    
+    def __init__(self, cache_path: Path):
+        self.path = Path(cache_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != HASH_CACHE_VERSION:
+            if version:
+                logger.info(f"Hash cache {self.path} was written by an older deduplicator; re-hashing all files")
+            self.connection.execute('DROP TABLE IF EXISTS hashes')
+            self.connection.execute(f'PRAGMA user_version = {HASH_CACHE_VERSION}')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS hashes ('
+            'device INTEGER, inode INTEGER, member TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER, value TEXT, '
+            'PRIMARY KEY (device, inode, member, kind))')
+        self.connection.commit()
+        # Identity of each file looked up this run, so it is only stat'ed once
+        self.identities: Dict[Path, tuple | None] = {}
+        self.pending_writes = 0
+        self.hits = 0
+        self.stored = 0
+    
+    def identity(self, filepath: Path, zip_members: dict) -> tuple | None:
+        """(device, inode, member, size, mtime_ns) of a file, or of the archive holding it"""
+        if filepath not in self.identities:
+            member = zip_members.get(filepath)
+            try:
+                stat = (member.archive if member else filepath).stat()
+                self.identities[filepath] = (stat.st_dev, stat.st_ino, member.name if member else '',
+                                             stat.st_size, stat.st_mtime_ns)
+            except OSError as e:
+                logger.debug(f"Hash cache cannot identify {filepath}: {e}")
+                self.identities[filepath] = None
+        return self.identities[filepath]
+    
+    def get(self, filepath: Path, kind: str, zip_members: dict) -> str | None:
+        """Return a cached hash of the given kind, or None when missing or the file has changed"""
+        identity = self.identity(filepath, zip_members)
+        if identity is None:
+            return None
+        device, inode, member, size, mtime_ns = identity
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT value FROM hashes WHERE device = ? AND inode = ? AND member = ? AND kind = ? '
+                'AND size = ? AND mtime_ns = ?', (device, inode, member, kind, size, mtime_ns)).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+            return row[0]
+    
+    def put(self, filepath: Path, kind: str, value: str, zip_members: dict):
+        """Store a freshly computed hash, replacing whatever an older version of the file left"""
+        identity = self.identity(filepath, zip_members)
+        if identity is None:
+            return
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    (*identity[:3], kind, *identity[3:], value))
+            self.stored += 1
+            self.pending_writes += 1
+            if self.pending_writes >= HASH_CACHE_COMMIT_EVERY:
+                self.connection.commit()
+                self.pending_writes = 0
+    
+    def save(self):
+        """Commit pending writes"""
+        with self.lock:
+            self.connection.commit()
+            self.pending_writes = 0
+
 class FileDeduplicator:
-    def __init__(self, input_directory: str, output_directory: str):
+    def __init__(self, input_directory: str, output_directory: str, semantic_xlsx: bool = True,
+                 hash_cache_path: str | None = None, hash_jobs: int = DEFAULT_HASH_JOBS):
         self.input_dir = Path(input_directory)
         self.output_dir = Path(output_directory)
         self.output_dir.mkdir(exist_ok=True)
+        # Compare .xlsx files by cell values rather than bytes
+        self.semantic_xlsx = semantic_xlsx
+        self.hash_cache = None
+        if hash_cache_path:
+            try:
+                self.hash_cache = HashCache(hash_cache_path)
+            except sqlite3.Error as e:
+                logger.warning(f"Ignoring unusable hash cache {hash_cache_path}: {e}")
+        self.hash_jobs = hash_jobs
         
         # Track processed files and their hashes
         self.file_hashes: Dict[str, str] = {}  # hash -> original_path
         self.processed_files: Set[str] = set()
         self.duplicate_files: List[str] = []
+        # Content kind per accepted file; rejected files with the reason
+        self.file_kinds: Dict[Path, str] = {}
+        self.rejected_files: List[tuple] = []
+        # Virtual paths (archive.zip/member) of files read straight from zip archives
+        self.zip_members: Dict[Path, object] = {}
+        # Duplicate-detection keys of binary files, decided up front by plan_duplicate_keys
+        self.binary_keys: Dict[Path, str] = {}
+        # Cell-content hash of each distinct workbook, by binary key
+        self.xlsx_hashes: Dict[str, str] = {}
+        # Content hash of every file, computed ahead of the duplicate decisions
+        self.content_hashes: Dict[Path, str | None] = {}
         
     def clean_filename(self, text: str) -> str:
         """Clean text for use in filename"""
@@ -35,42 +154,293 @@ class FileDeduplicator:
         text = re.sub(r'[-_]+', '_', text)  # Collapse multiple separators
         return text.strip('_-')
     
-    def get_csv_content_hash(self, filepath: Path) -> str | None:
+    def cached_hash(self, filepath: Path, kind: str) -> str | None:
+        """A hash of the given kind from the hash cache, if one is configured and the file is unchanged"""
+        if self.hash_cache is None:
+            return None
+        return self.hash_cache.get(filepath, kind, self.zip_members)
+
+    def cache_hash(self, filepath: Path, kind: str, value: str) -> str:
+        """Remember a freshly computed hash in the hash cache, if one is configured"""
+        if self.hash_cache is not None:
+            self.hash_cache.put(filepath, kind, value, self.zip_members)
+        return value
+
+    def hash_source(self, filepath: Path, data: bytes | None):
+        """What a content hash parses: bytes already read ahead, or the file itself"""
+        if data is not None:
+            return io.BytesIO(data)
+        return open_source(filepath, self.zip_members)
+
+    def get_csv_content_hash(self, filepath: Path, data: bytes | None = None) -> str | None:
         """Computes a SHA256 hash of the CSV content, ignoring header and column order."""
+        cached = self.cached_hash(filepath, 'csv')
+        if cached:
+            return cached
+        import pandas as pd  # Imported lazily so --test and --help start quickly
         try:
-            df = pd.read_csv(filepath, header=0, on_bad_lines='skip')
+            df = pd.read_csv(self.hash_source(filepath, data), header=0, on_bad_lines='skip')
             if df.empty:
-                return "EMPTY_FILE"
+                return self.cache_hash(filepath, 'csv', "EMPTY_FILE")
             # Sort columns to ensure order doesn't affect hash
             df = df.reindex(sorted(df.columns), axis=1)
-            # Convert to a canonical string representation
-            data_string = df.to_string(index=False).encode('utf-8')
-            return hashlib.sha256(data_string).hexdigest()
+            # Header, then one vectorized 64-bit hash per row, in row order
+            hash_sha256 = hashlib.sha256('\x1f'.join(map(str, df.columns)).encode('utf-8'))
+            hash_sha256.update(pd.util.hash_pandas_object(df, index=False, categorize=False).to_numpy().tobytes())
+            return self.cache_hash(filepath, 'csv', hash_sha256.hexdigest())
         except pd.errors.EmptyDataError:
             # Return a specific hash for files with only a header
-            return "HEADER_ONLY_FILE"
+            return self.cache_hash(filepath, 'csv', "HEADER_ONLY_FILE")
         except Exception as e:
             logger.error(f"Could not read or process CSV for hashing {filepath}: {e}")
             return None
 
     def get_binary_hash(self, filepath: Path) -> str:
         """Generate SHA256 hash of file's binary content for duplicate detection."""
+        cached = self.cached_hash(filepath, 'sha256')
+        if cached:
+            return cached
         try:
             hash_sha256 = hashlib.sha256()
+            if filepath in self.zip_members:
+                hash_sha256.update(read_source_bytes(filepath, self.zip_members))
+                return self.cache_hash(filepath, 'sha256', hash_sha256.hexdigest())
             with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
+                for chunk in iter(lambda: f.read(HASH_BUFFER_BYTES), b""):
                     hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()
+            return self.cache_hash(filepath, 'sha256', hash_sha256.hexdigest())
         except Exception as e:
             logger.error(f"Error hashing file {filepath}: {e}")
             return ""
 
-    def get_content_hash(self, filepath: Path) -> str | None:
+    def get_partial_hash(self, filepath: Path, size: int) -> str:
+        """SHA256 of the first and last PARTIAL_HASH_BYTES of a file.
+        
+        Files no larger than both ends together are hashed whole, so for them
+        the result equals get_binary_hash().
+        """
+        cached = self.cached_hash(filepath, 'partial')
+        if cached:
+            return cached
+        hash_sha256 = hashlib.sha256()
+        if filepath in self.zip_members:
+            data = read_source_bytes(filepath, self.zip_members)
+            if size > 2 * PARTIAL_HASH_BYTES:
+                data = data[:PARTIAL_HASH_BYTES] + data[-PARTIAL_HASH_BYTES:]
+            hash_sha256.update(data)
+            return self.cache_hash(filepath, 'partial', hash_sha256.hexdigest())
+        with open(filepath, "rb") as f:
+            if size <= 2 * PARTIAL_HASH_BYTES:
+                hash_sha256.update(f.read())
+            else:
+                hash_sha256.update(f.read(PARTIAL_HASH_BYTES))
+                f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+                hash_sha256.update(f.read(PARTIAL_HASH_BYTES))
+        return self.cache_hash(filepath, 'partial', hash_sha256.hexdigest())
+
+    def map_hashes(self, func, items: list) -> list:
+        """Apply a hashing function to every item on a thread pool, returning results in item order"""
+        if self.hash_jobs <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.hash_jobs) as executor:
+            return list(executor.map(func, items))
+
+    def plan_duplicate_keys(self, files: List[Path]):
+        """Decide an exact duplicate-detection key for every binary file, reading as little as possible.
+        
+        Files are bucketed by size; a file with a unique size cannot have a
+        duplicate and is never read. Within a bucket the first and last 64 KB
+        are hashed, and only files whose partial hashes collide get a full
+        hash. Keys are only equal for files with identical content.
+        """
+        by_size = defaultdict(list)
+        for filepath in files:
+            if filepath.suffix.lower() == '.csv':
+                continue
+            try:
+                by_size[source_size(filepath, self.zip_members)].append(filepath)
+            except OSError as e:
+                logger.error(f"Error reading size of {filepath}: {e}")
+        
+        tiers = {'size': 0, 'partial': 0, 'full': 0}
+        candidates = []
+        for size, same_size in by_size.items():
+            if len(same_size) == 1:
+                self.binary_keys[same_size[0]] = f"size:{size}"
+                tiers['size'] += 1
+            else:
+                candidates.extend((filepath, size) for filepath in same_size)
+        
+        def partial_hash(candidate):
+            filepath, size = candidate
+            try:
+                return self.get_partial_hash(filepath, size)
+            except Exception as e:
+                logger.error(f"Error hashing file {filepath}: {e}")
+                return None
+        
+        by_partial = defaultdict(list)
+        for (filepath, size), hash_value in zip(candidates, self.map_hashes(partial_hash, candidates)):
+            if hash_value is not None:
+                by_partial[(size, hash_value)].append(filepath)
+        
+        needs_full_hash = []
+        for (size, hash_value), same_partial in by_partial.items():
+            if size <= 2 * PARTIAL_HASH_BYTES:
+                # The partial hash already covered the whole file
+                for filepath in same_partial:
+                    self.binary_keys[filepath] = hash_value
+                tiers['partial'] += len(same_partial)
+            elif len(same_partial) == 1:
+                self.binary_keys[same_partial[0]] = f"partial:{size}:{hash_value}"
+                tiers['partial'] += 1
+            else:
+                needs_full_hash.extend(same_partial)
+        
+        for filepath, full_hash in zip(needs_full_hash, self.map_hashes(self.get_binary_hash, needs_full_hash)):
+            self.binary_keys[filepath] = full_hash
+        tiers['full'] = len(needs_full_hash)
+        
+        logger.info(f"Duplicate keys: {tiers['size']} files by unique size, {tiers['partial']} by partial hash, "
+                    f"{tiers['full']} needed a full hash")
+
+    @staticmethod
+    def normalize_cell(value) -> str:
+        """Canonical text of a cell value, so 5, 5.0 and a re-saved 5 compare equal."""
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'TRUE' if value else 'FALSE'
+        if isinstance(value, (int, float)):
+            number = float(value)
+            return str(int(number)) if number.is_integer() else repr(number)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def get_xlsx_content_hash(self, filepath: Path, data: bytes | None = None) -> str | None:
+        """Computes a SHA256 hash of a workbook's sheet names and cell values.
+        
+        Cells are streamed with openpyxl in read-only mode, using the cached
+        results of formulas. Trailing empty cells and rows are ignored, so a
+        workbook that was only re-saved hashes the same as the original.
+        Byte-identical files share the result through their binary key.
+        """
+        binary_key = self.binary_keys.get(filepath)
+        if binary_key and binary_key in self.xlsx_hashes:
+            return self.xlsx_hashes[binary_key]
+        cached = self.cached_hash(filepath, 'xlsx')
+        if cached:
+            if binary_key:
+                self.xlsx_hashes[binary_key] = cached
+            return cached
+        
+        import openpyxl  # Imported lazily so --test and --help start quickly
+        try:
+            hash_sha256 = hashlib.sha256()
+            workbook = openpyxl.load_workbook(self.hash_source(filepath, data), read_only=True, data_only=True)
+            try:
+                for worksheet in workbook.worksheets:
+                    hash_sha256.update(b'\x1d' + worksheet.title.encode('utf-8'))
+                    pending_empty_rows = 0
+                    for row in worksheet.iter_rows(values_only=True):
+                        cells = [self.normalize_cell(value) for value in row]
+                        while cells and cells[-1] == '':
+                            cells.pop()
+                        if not cells:
+                            pending_empty_rows += 1
+                            continue
+                        # Empty rows only count when something follows them
+                        hash_sha256.update(b'\x1e' * (pending_empty_rows + 1))
+                        pending_empty_rows = 0
+                        hash_sha256.update('\x1f'.join(cells).encode('utf-8'))
+            finally:
+                workbook.close()
+        except Exception as e:
+            logger.warning(f"Could not read workbook cells of {filepath}, comparing bytes instead: {e}")
+            return binary_key or self.get_binary_hash(filepath)
+        
+        content_hash = f"xlsx:{hash_sha256.hexdigest()}"
+        if binary_key:
+            self.xlsx_hashes[binary_key] = content_hash
+        return self.cache_hash(filepath, 'xlsx', content_hash)
+
+    def content_hash_kind(self, filepath: Path) -> str:
+        """Which content hash decides duplicates for a file: 'csv', 'xlsx' or 'binary'"""
+        kind = self.file_kinds.get(filepath)
+        if filepath.suffix.lower() == '.csv' and kind in (None, 'text'):
+            return 'csv'
+        elif self.semantic_xlsx and (kind == 'zip' or (kind is None and filepath.suffix.lower() == '.xlsx')):
+            return 'xlsx'
+        return 'binary'
+
+    def get_content_hash(self, filepath: Path, data: bytes | None = None) -> str | None:
         """Dispatches to the correct hashing function based on file type."""
-        if filepath.suffix.lower() == '.csv':
-            return self.get_csv_content_hash(filepath)
+        hash_kind = self.content_hash_kind(filepath)
+        if hash_kind == 'csv':
+            return self.get_csv_content_hash(filepath, data)
+        elif hash_kind == 'xlsx':
+            return self.get_xlsx_content_hash(filepath, data)
         else:
-            return self.get_binary_hash(filepath)
+            return self.binary_keys.get(filepath) or self.get_binary_hash(filepath)
+
+    def read_ahead(self, filepath: Path) -> bytes | None:
+        """All bytes of a file, for parsing later; None leaves the error to the parser"""
+        try:
+            return read_source_bytes(filepath, self.zip_members)
+        except Exception as e:
+            logger.debug(f"Could not read {filepath} ahead of hashing: {e}")
+            return None
+
+    def compute_content_hashes(self, files: List[Path]):
+        """Hash the content of every file ahead of the duplicate decisions.
+        
+        Files are read on a pool of hash_jobs threads while this thread parses
+        them in discovery order, so slow reads overlap and the GIL-bound CSV
+        and workbook parsing never competes with itself. Only a few files are
+        held in memory at a time. is_duplicate_file() still walks the files in
+        discovery order, so the first-seen copy wins exactly as before.
+        """
+        first_with_key: Dict[str, Path] = {}
+        to_parse = []
+        for filepath in files:
+            binary_key = self.binary_keys.get(filepath)
+            if binary_key is not None:
+                if binary_key in first_with_key:
+                    continue
+                first_with_key[binary_key] = filepath
+            hash_kind = self.content_hash_kind(filepath)
+            if hash_kind == 'binary':
+                self.content_hashes[filepath] = self.get_content_hash(filepath)
+                continue
+            cached = self.cached_hash(filepath, hash_kind)
+            if cached:
+                self.content_hashes[filepath] = cached
+            else:
+                to_parse.append(filepath)
+        
+        if self.hash_jobs <= 1:
+            for filepath in to_parse:
+                self.content_hashes[filepath] = self.get_content_hash(filepath)
+        else:
+            with ThreadPoolExecutor(max_workers=self.hash_jobs) as executor:
+                upcoming = iter(to_parse)
+                reads = deque()
+                for filepath in upcoming:
+                    reads.append((filepath, executor.submit(self.read_ahead, filepath)))
+                    if len(reads) == 2 * self.hash_jobs:
+                        break
+                while reads:
+                    filepath, read = reads.popleft()
+                    following = next(upcoming, None)
+                    if following is not None:
+                        reads.append((following, executor.submit(self.read_ahead, following)))
+                    self.content_hashes[filepath] = self.get_content_hash(filepath, read.result())
+        
+        # Byte-identical copies share the hash of the first copy
+        for filepath in files:
+            if filepath not in self.content_hashes:
+                self.content_hashes[filepath] = self.content_hashes[first_with_key[self.binary_keys[filepath]]]
 
     def generate_unique_filename(self, filepath: Path, sheet_name: str = None) -> str:
         """Generate unique filename based on full path structure (handles deep nesting)"""
@@ -124,7 +494,10 @@ class FileDeduplicator:
 
     def is_duplicate_file(self, filepath: Path) -> bool:
         """Check if file is a duplicate based on content hash."""
-        file_hash = self.get_content_hash(filepath)
+        if filepath in self.content_hashes:
+            file_hash = self.content_hashes[filepath]
+        else:
+            file_hash = self.get_content_hash(filepath)
         if not file_hash:
             logger.warning(f"Could not generate hash for {filepath}. Skipping duplicate check.")
             return False
@@ -139,15 +512,16 @@ class FileDeduplicator:
     
     def process_excel_file(self, filepath: Path) -> List[str]:
         """Process Excel file and split sheets into separate CSVs"""
+        import pandas as pd
         output_files = []
         
         try:
             # Read all sheets
-            excel_file = pd.ExcelFile(filepath)
+            excel_file = pd.ExcelFile(open_source(filepath, self.zip_members))
             
             for sheet_name in excel_file.sheet_names:
                 try:
-                    df = pd.read_excel(filepath, sheet_name=sheet_name)
+                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
                     
                     # Skip empty sheets
                     if df.empty or df.shape[0] == 0:
@@ -183,11 +557,12 @@ class FileDeduplicator:
     
     def process_csv_file(self, filepath: Path) -> List[str]:
         """Process CSV file (copy with unique name)"""
+        import pandas as pd
         output_files = []
         
         try:
             # Try reading to validate it's a proper CSV
-            df = pd.read_csv(filepath)
+            df = pd.read_csv(open_source(filepath, self.zip_members))
             
             if df.empty:
                 logger.info(f"Skipping empty CSV: {filepath}")
@@ -235,8 +610,11 @@ class FileDeduplicator:
                 counter += 1
             
             # Copy PDF file
-            import shutil
-            shutil.copy2(filepath, output_path)
+            if filepath in self.zip_members:
+                output_path.write_bytes(read_source_bytes(filepath, self.zip_members))
+            else:
+                import shutil
+                shutil.copy2(filepath, output_path)
             output_files.append(str(output_path))
             
             logger.info(f"Copied PDF: {filepath} -> {output_path}")
@@ -247,21 +625,27 @@ class FileDeduplicator:
         return output_files
     
     def find_all_files(self) -> List[Path]:
-        """Find all relevant files recursively"""
-        supported_extensions = ['.xlsx', '.xls', '.csv', '.pdf']
-        files = []
+        """Find all relevant files recursively, including members of zip archives
         
-        for root, dirs, filenames in os.walk(self.input_dir):
-            for filename in filenames:
-                if any(filename.lower().endswith(ext) for ext in supported_extensions):
-                    files.append(Path(root) / filename)
+        Junk (AppleDouble, lock files, ...) is rejected by content, and archive
+        members that were already extracted next to their archive are skipped.
+        """
+        found = discover_files(self.input_dir)
+        self.file_kinds.update(found.kinds)
+        self.zip_members.update(found.zip_members)
+        self.rejected_files = [(str(filepath), reason) for filepath, reason in found.rejected]
+        for filepath, reason in found.rejected:
+            logger.debug(f"Rejected {filepath}: {reason}")
         
-        logger.info(f"Found {len(files)} files to process")
-        return files
+        logger.info(f"Found {len(found.files)} files to process ({len(found.zip_members)} inside zip archives, "
+                    f"{len(self.rejected_files)} rejected)")
+        return found.files
     
     def process_all_files(self):
         """Main processing function"""
         files = self.find_all_files()
+        self.plan_duplicate_keys(files)
+        self.compute_content_hashes(files)
         all_output_files = []
         
         for filepath in files:
@@ -271,12 +655,13 @@ class FileDeduplicator:
             if self.is_duplicate_file(filepath):
                 continue
             
-            # Process based on file type
-            if filepath.suffix.lower() in ['.xlsx', '.xls']:
+            # Process based on content type (a workbook saved as .csv is still a workbook)
+            kind = self.file_kinds.get(filepath)
+            if kind in ('zip', 'ole'):
                 output_files = self.process_excel_file(filepath)
-            elif filepath.suffix.lower() == '.csv':
+            elif kind == 'text':
                 output_files = self.process_csv_file(filepath)
-            elif filepath.suffix.lower() == '.pdf':
+            elif kind == 'pdf':
                 output_files = self.process_pdf_file(filepath)
             else:
                 continue
@@ -284,12 +669,16 @@ class FileDeduplicator:
             all_output_files.extend(output_files)
             self.processed_files.add(str(filepath))
         
-        self.generate_summary_report(all_output_files)
+        if self.hash_cache is not None:
+            self.hash_cache.save()
+            logger.info(f"Hash cache: {self.hash_cache.hits} hashes reused, {self.hash_cache.stored} computed")
+        self.generate_summary_report(all_output_files, len(files))
     
-    def generate_summary_report(self, output_files: List[str]):
+    def generate_summary_report(self, output_files: List[str], files_found: int):
         """Generate summary of processing"""
         summary = {
-            'Total Input Files Found': len(self.find_all_files()),
+            'Total Input Files Found': files_found,
+            'Files Rejected Before Parsing': len(self.rejected_files),
             'Duplicate Files Skipped': len(self.duplicate_files),
             'Unique Files Processed': len(self.processed_files),
             'Output CSV Files Created': len([f for f in output_files if f.endswith('.csv')]),
@@ -306,6 +695,12 @@ class FileDeduplicator:
             for key, value in summary.items():
                 f.write(f"{key}: {value}\n")
             
+            if self.rejected_files:
+                f.write(f"\nREJECTED FILES ({len(self.rejected_files)}):\n")
+                f.write("-" * 30 + "\n")
+                for rejected_file, reason in self.rejected_files:
+                    f.write(f"  {rejected_file} ({reason})\n")
+            
             if self.duplicate_files:
                 f.write(f"\nDUPLICATE FILES FOUND ({len(self.duplicate_files)}):\n")
                 f.write("-" * 30 + "\n")
@@ -359,8 +754,16 @@ def main():
     parser.add_argument('output_dir', help='Directory for normalized output files')
     parser.add_argument('--test', action='store_true', help='Test filename generation')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--byte-compare-xlsx', action='store_true',
+                        help='Compare workbooks by bytes instead of cell values (faster, but re-saved copies count as unique)')
+    parser.add_argument('--hash-cache', metavar='PATH',
+                        help='SQLite file of file hashes reused by later runs while files are unchanged')
+    parser.add_argument('--hash-jobs', type=int, default=DEFAULT_HASH_JOBS,
+                        help=f'Threads hashing files concurrently (default: {DEFAULT_HASH_JOBS})')
     
     args = parser.parse_args()
+    if args.hash_jobs < 1:
+        parser.error('--hash-jobs must be at least 1')
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -371,7 +774,8 @@ def main():
         print(f"Error: Input directory '{args.input_dir}' does not exist")
         return
     
-    processor = FileDeduplicator(args.input_dir, args.output_dir)
+    processor = FileDeduplicator(args.input_dir, args.output_dir, semantic_xlsx=not args.byte_compare_xlsx,
+                                 hash_cache_path=args.hash_cache, hash_jobs=args.hash_jobs)
     
     if args.test:
         processor.test_filename_generation()
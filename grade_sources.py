@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Grade Source Classification
+Decides from a file's first bytes which parser (if any) should open it, so
+junk such as macOS AppleDouble files or Office lock files is rejected before
+pandas, openpyxl or pypdf ever see it. Grade files inside .zip archives are
+discovered as virtual files ("archive.zip/member.xlsx") and read straight from
+the archive without extracting them to disk.
+"""
+
+import codecs
+import io
+import os
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.pdf')
+ARCHIVE_EXTENSION = '.zip'
+
+# Bytes read from the start of each file for classification
+SNIFF_BYTES = 8 * 1024
+
+ZIP_MAGIC = b'PK\x03\x04'                           # .xlsx (Office Open XML)
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'     # legacy .xls (OLE2 compound file)
+PDF_MAGIC = b'%PDF-'
+APPLEDOUBLE_MAGIC = b'\x00\x05\x16\x07'             # macOS resource fork ("._name", __MACOSX/)
+# PDF readers accept a header anywhere in the first KB
+PDF_HEADER_WINDOW = 1024
+# Unicode text, e.g. Excel "Unicode Text" exports, which are UTF-16 and full of NUL bytes
+TEXT_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+# Content kinds each extension may contain. A .csv that is really a workbook
+# is routed to the Excel reader; a .pdf must be a PDF.
+ACCEPTED_KINDS = {
+    '.xlsx': ('zip', 'ole'),
+    '.xls': ('ole', 'zip'),
+    '.csv': ('text', 'zip', 'ole'),
+    '.pdf': ('pdf',),
+    ARCHIVE_EXTENSION: ('zip',),
+}
+
+# What zipfile raises for a member it cannot decompress: encrypted members
+# (RuntimeError), unsupported compression methods (NotImplementedError) and
+# corrupt or truncated streams (BadZipFile, zlib.error, EOFError)
+MEMBER_READ_ERRORS = (OSError, EOFError, RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error)
+
+class UnreadableMemberError(OSError):
+    """An archive member that cannot be decompressed"""
+
+@dataclass(frozen=True)
+class FileClass:
+    """Outcome of classifying one file: a content kind to parse, or a reason to skip it"""
+    kind: str | None = None
+    rejected: str | None = None
+
+@dataclass(frozen=True)
+class ZipMember:
+    """A grade file stored inside a zip archive"""
+    archive: Path
+    name: str
+    # Uncompressed size
+    size: int = 0
+
+@dataclass
+class DiscoveredFiles:
+    """Grade files found under a directory, in os.walk order"""
+    files: list[Path] = field(default_factory=list)
+    # Content kind of every accepted file
+    kinds: dict[Path, str] = field(default_factory=dict)
+    # Virtual paths of files that live inside archives
+    zip_members: dict[Path, ZipMember] = field(default_factory=dict)
+    rejected: list[tuple[Path, str]] = field(default_factory=list)
+    # Archive members skipped because an extracted copy sits next to the archive
+    already_extracted: list[Path] = field(default_factory=list)
+
+def sniff_kind(head: bytes) -> str:
+    """Content kind of a file from its first bytes"""
+    if head.startswith(APPLEDOUBLE_MAGIC):
+        return 'appledouble'
+    if head.startswith(ZIP_MAGIC):
+        return 'zip'
+    if head.startswith(OLE_MAGIC):
+        return 'ole'
+    if PDF_MAGIC in head[:PDF_HEADER_WINDOW]:
+        return 'pdf'
+    if head.startswith(TEXT_BOMS) or b'\x00' not in head:
+        return 'text'
+    return 'binary'
+
+def classify_bytes(name: str, size: int, head: bytes) -> FileClass:
+    """Classify a file from its name, size and first bytes"""
+    if name.startswith('~$'):
+        return FileClass(rejected='Office lock file')
+    if size == 0:
+        return FileClass(rejected='empty file')
+    kind = sniff_kind(head)
+    if kind == 'appledouble':
+        return FileClass(rejected='macOS AppleDouble metadata')
+    extension = os.path.splitext(name)[1].lower()
+    if kind not in ACCEPTED_KINDS.get(extension, ()):
+        return FileClass(rejected=f"{kind} content in a {extension} file")
+    return FileClass(kind=kind)
+
+def classify_file(filepath: Path) -> FileClass:
+    """Classify a file on disk by reading only its first few KB"""
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+        size = filepath.stat().st_size
+    except OSError as e:
+        return FileClass(rejected=f"unreadable ({e.strerror})")
+    return classify_bytes(filepath.name, size, head)
+
+def scan_archive(archive: Path, found: DiscoveredFiles):
+    """Add the supported members of a zip archive to found as virtual files
+    
+    A member that cannot be decompressed is rejected on its own; the rest of
+    the archive is still scanned.
+    """
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    continue
+                virtual = archive / info.filename
+                # Archives that were already unpacked in place would otherwise be read twice
+                if (archive.parent / info.filename).is_file():
+                    found.already_extracted.append(virtual)
+                    continue
+                try:
+                    with zf.open(info) as member:
+                        head = member.read(SNIFF_BYTES)
+                except MEMBER_READ_ERRORS as e:
+                    found.rejected.append((virtual, member_error_reason(e)))
+                    continue
+                file_class = classify_bytes(Path(info.filename).name, info.file_size, head)
+                if file_class.rejected:
+                    found.rejected.append((virtual, file_class.rejected))
+                    continue
+                found.files.append(virtual)
+                found.kinds[virtual] = file_class.kind
+                found.zip_members[virtual] = ZipMember(archive, info.filename, info.file_size)
+    except (OSError, zipfile.BadZipFile) as e:
+        found.rejected.append((archive, f"unreadable zip archive ({e})"))
+
+def member_error_reason(error: BaseException) -> str:
+    """Rejection reason for an archive member zipfile could not decompress"""
+    if isinstance(error, RuntimeError) and 'encrypted' in str(error):
+        return 'encrypted zip member'
+    if isinstance(error, NotImplementedError):
+        return 'unsupported zip compression'
+    return f"unreadable zip member ({error})"
+
+def discover_files(root: Path) -> DiscoveredFiles:
+    """Walk root for grade files and the grade files inside zip archives, classifying each"""
+    found = DiscoveredFiles()
+    for dirpath, dirs, filenames in os.walk(root):
+        for filename in filenames:
+            filepath = Path(dirpath) / filename
+            lowered = filename.lower()
+            if lowered.endswith(ARCHIVE_EXTENSION):
+                file_class = classify_file(filepath)
+                if file_class.kind == 'zip':
+                    scan_archive(filepath, found)
+                else:
+                    found.rejected.append((filepath, file_class.rejected or 'not a zip archive'))
+            elif lowered.endswith(SUPPORTED_EXTENSIONS):
+                file_class = classify_file(filepath)
+                if file_class.rejected:
+                    found.rejected.append((filepath, file_class.rejected))
+                    continue
+                found.files.append(filepath)
+                found.kinds[filepath] = file_class.kind
+    return found
+
+def read_member(member: ZipMember) -> bytes:
+    """Decompress one archive member into memory
+    
+    Raises UnreadableMemberError (an OSError) with the reason when the member
+    is encrypted, uses an unsupported compression method or is corrupt.
+    """
+    try:
+        with zipfile.ZipFile(member.archive) as zf:
+            return zf.read(member.name)
+    except MEMBER_READ_ERRORS as e:
+        raise UnreadableMemberError(f"{member_error_reason(e)}: {member.archive}/{member.name}") from e
+
+def open_source(filepath: Path, zip_members: dict[Path, ZipMember]):
+    """Something pandas/openpyxl can read: the path itself, or an in-memory copy of an archive member"""
+    member = zip_members.get(filepath)
+    if member is None:
+        return filepath
+    return io.BytesIO(read_member(member))
+
+def source_size(filepath: Path, zip_members: dict[Path, ZipMember]) -> int:
+    """Size in bytes of a file on disk or (uncompressed) inside an archive"""
+    member = zip_members.get(filepath)
+    if member is not None:
+        return member.size
+    return filepath.stat().st_size
+
+def read_source_bytes(filepath: Path, zip_members: dict[Path, ZipMember]) -> bytes:
+    """All bytes of a file on disk or inside an archive"""
+    member = zip_members.get(filepath)
+    if member is not None:
+        return read_member(member)
+    with open(filepath, 'rb') as f:
+        return f.read()
@@ -4,20 +4,53 @@ Moodle Grade Data Processor
 Automatically processes various grade file formats and extracts data for SIS import
 """
 
-import pandas as pd
+from __future__ import annotations
+
 import os
+import sys
 import re
+import json
+import hashlib
+import importlib.util
+import codecs
+import io
+import shutil
+import time
 from pathlib import Path
 import logging
 from dataclasses import dataclass
-import openpyxl  # noqa: F401
-import pypdf
+from contextlib import contextmanager
+from collections.abc import Callable, Iterator
+from functools import lru_cache
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from grade_sources import ZipMember, classify_file, discover_files, open_source, read_source_bytes
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def lazy_import(name: str):
+    """Return a module that is only really imported on first attribute access
+    
+    Keeps --help and other quick invocations from paying for pandas. Excel
+    engines and pypdf are imported inside the code paths that use them.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+pd = lazy_import('pandas')
+
 @dataclass
 class GradeRecord:
     student_id: str
@@ -27,11 +60,745 @@ class GradeRecord:
     term: str
     file_source: str
 
+@dataclass(frozen=True)
+class DetectedColumns:
+    """Columns found in a header for each role extract_grades_from_dataframe needs"""
+    grade: str | None
+    student_id: str | None
+    first_name: str | None
+    last_name: str | None
+    full_name: str | None
+
+@lru_cache(maxsize=None)
+def compile_column_patterns(patterns: tuple[str, ...]) -> re.Pattern:
+    """Combine a pattern list into one compiled regex that matches if any pattern does"""
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+# Excel reader backends, selectable with --excel-engine. pandas' openpyxl reader
+# already loads workbooks in read-only (streaming) mode; calamine is a Rust-backed
+# reader from the optional python-calamine package.
+EXCEL_READERS: dict[str, Callable[..., pd.DataFrame]] = {
+    'openpyxl': lambda source, sheet_name=0: pd.read_excel(source, engine='openpyxl', sheet_name=sheet_name),
+    'calamine': lambda source, sheet_name=0: pd.read_excel(source, engine='calamine', sheet_name=sheet_name),
+}
+
+def excel_engine_available(engine: str) -> bool:
+    """Check whether the library behind an Excel reader backend is installed"""
+    module = {'openpyxl': 'openpyxl', 'calamine': 'python_calamine'}.get(engine)
+    return module is not None and importlib.util.find_spec(module) is not None
+
+def resolve_excel_engine(engine: str) -> str:
+    """Map 'auto' to the fastest installed backend"""
+    if engine == 'auto':
+        return 'calamine' if excel_engine_available('calamine') else 'openpyxl'
+    return engine
+
+# Writers for the processed_grades export, selectable with --format. Parquet is
+# written as a dataset directory partitioned by term and course so staging jobs
+# can read only the partitions they need; Arrow is a single Feather v2 (Arrow
+# IPC) file. Both need the optional pyarrow package.
+PARQUET_PARTITION_COLS = ['Term', 'Course_Code']
+
+EXPORT_WRITERS: dict[str, Callable[[pd.DataFrame, Path], None]] = {
+    'xlsx': lambda df, path: df.to_excel(path, index=False),
+    'csv': lambda df, path: df.to_csv(path, index=False),
+    'parquet': lambda df, path: df.to_parquet(path, partition_cols=PARQUET_PARTITION_COLS, index=False),
+    'arrow': lambda df, path: df.reset_index(drop=True).to_feather(path),
+}
+
+def export_format_available(fmt: str) -> bool:
+    """Check whether the library behind an export format is installed"""
+    if fmt in ('parquet', 'arrow'):
+        return importlib.util.find_spec('pyarrow') is not None
+    return fmt in EXPORT_WRITERS
+
+def temp_path(path: Path) -> Path:
+    """Hidden sibling of path used while it is being written; the suffix is kept
+    so writers that pick a format from the extension still work"""
+    return path.with_name(f".{path.stem}.tmp{path.suffix}")
+
+def write_atomic(path: Path, writer: Callable[..., None], *args) -> Path:
+    """Call writer(tmp_path, *args), then rename the result into place
+    
+    Readers never see a half-written report: the file (or Parquet dataset
+    directory) only appears under its final name once it is complete.
+    """
+    tmp = temp_path(path)
+    try:
+        writer(tmp, *args)
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.is_dir():
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            tmp.unlink(missing_ok=True)
+        raise
+    return path
+
+def write_records(path: Path, df: pd.DataFrame, fmt: str):
+    EXPORT_WRITERS[fmt](df, path)
+
+def write_sis_csv(path: Path, df: pd.DataFrame):
+    df[df['Student_ID'] != ''].to_csv(path, index=False)  # Only records with student IDs
+
+def write_summary_workbook(path: Path, summary_df: pd.DataFrame, course_summary: pd.DataFrame,
+                           file_summary: pd.DataFrame):
+    with pd.ExcelWriter(path) as writer:
+        summary_df.to_excel(writer, sheet_name='Summary', index=False)
+        course_summary.to_excel(writer, sheet_name='Course_Breakdown')
+        file_summary.to_excel(writer, sheet_name='Files_Processed')
+
+class RunProfiler:
+    """Per-file, per-stage wall-clock timers behind --profile
+    
+    Samples are (stage, file, seconds) tuples; file is empty for run-level
+    stages such as discovery. Worker processes drain their samples after
+    every file and the parent merges them, so stage totals add up time
+    across workers rather than wall time.
+    """
+    
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.samples: list[tuple[str, str, float]] = []
+        self.started = time.perf_counter()
+    
+    @contextmanager
+    def stage(self, stage: str, filepath: Path | None = None):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, filepath, time.perf_counter() - start)
+    
+    def add(self, stage: str, filepath: Path | None, seconds: float):
+        if self.enabled:
+            self.samples.append((stage, str(filepath) if filepath else '', seconds))
+    
+    def drain(self) -> list[tuple[str, str, float]]:
+        samples, self.samples = self.samples, []
+        return samples
+    
+    def merge(self, samples: list[tuple[str, str, float]]):
+        self.samples.extend(samples)
+    
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.samples, columns=['Stage', 'File', 'Seconds'])
+    
+    def report(self, run_id: str, slowest: int = 20) -> dict:
+        """Totals and percentiles per stage, plus the slowest files with their stage breakdown"""
+        df = self.to_frame()
+        stages = {}
+        for stage, seconds in df.groupby('Stage', sort=False)['Seconds']:
+            stages[stage] = {
+                'count': int(seconds.count()),
+                'total_seconds': round(float(seconds.sum()), 4),
+                'mean': round(float(seconds.mean()), 4),
+                'p50': round(float(seconds.quantile(0.5)), 4),
+                'p90': round(float(seconds.quantile(0.9)), 4),
+                'p99': round(float(seconds.quantile(0.99)), 4),
+                'max': round(float(seconds.max()), 4),
+            }
+        
+        per_file = df[df['File'] != ''].groupby(['File', 'Stage'], sort=False)['Seconds'].sum().unstack(fill_value=0.0)
+        slowest_files = []
+        if 'file' in per_file.columns:
+            for filepath, row in per_file.sort_values('file', ascending=False).head(slowest).iterrows():
+                slowest_files.append({
+                    'file': filepath,
+                    'seconds': round(float(row['file']), 4),
+                    'stages': {stage: round(float(v), 4) for stage, v in row.items() if stage != 'file' and v},
+                })
+        
+        return {
+            'run_id': run_id,
+            'wall_seconds': round(time.perf_counter() - self.started, 4),
+            'files': int(per_file.shape[0]),
+            'stages': stages,
+            'slowest_files': slowest_files,
+        }
+
+# Candidate CSV delimiters, in order of preference
+CSV_DELIMITERS = [',', ';', '\t']
+# Bytes read from the start of a CSV file to decide its dialect
+CSV_SNIFF_BYTES = 64 * 1024
+
+def sniff_csv_encoding(head: bytes) -> str:
+    """Encoding of a CSV file from its BOM, or from whether its first bytes are valid UTF-8"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # Incremental decode tolerates a multi-byte character cut off at the end of the sample
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def sniff_csv_delimiter(head: bytes, encoding: str, preferred: str | None = None) -> str:
+    """Delimiter of a CSV file from its first bytes, decoded with encoding
+    
+    The delimiter is the candidate that appears in the header line and most
+    consistently on the following lines, ignoring quoted fields. preferred
+    only breaks a tie between candidates that score the same.
+    """
+    lines = [line for line in head.decode(encoding, errors='replace').splitlines() if line.strip()]
+    if len(head) == CSV_SNIFF_BYTES and len(lines) > 1:
+        lines.pop()  # Probably truncated
+    lines = [re.sub(r'"[^"]*"', '', line) for line in lines[:50]]
+    
+    delimiter = CSV_DELIMITERS[0]
+    best_score = (0, 0)
+    for candidate in CSV_DELIMITERS:
+        counts = [line.count(candidate) for line in lines]
+        if not counts or counts[0] == 0:
+            continue
+        score = (sum(1 for count in counts if count == counts[0]), counts[0])
+        if score > best_score or (score == best_score and candidate == preferred):
+            delimiter, best_score = candidate, score
+    return delimiter
+
+# Columns of the record table, in report order
+RECORD_COLUMNS = ['Student_ID', 'Student_Name', 'Course_Code', 'Grade', 'Term', 'Source_File']
+
+# Joins file and worksheet in the Source_File of records from multi-sheet workbooks
+SHEET_SOURCE_SEPARATOR = '::'
+
+def source_file_path(source: str) -> str:
+    """The file part of a Source_File value, without any "::sheet" suffix"""
+    return source.partition(SHEET_SOURCE_SEPARATOR)[0]
+
+def records_to_frame(records: list[GradeRecord]) -> pd.DataFrame:
+    """Build a record batch from individual GradeRecords"""
+    return pd.DataFrame({
+        'Student_ID': [r.student_id for r in records],
+        'Student_Name': [r.student_name for r in records],
+        'Course_Code': [r.course_code for r in records],
+        'Grade': [float(r.grade) for r in records],
+        'Term': [r.term for r in records],
+        'Source_File': [r.file_source for r in records],
+    }, columns=RECORD_COLUMNS)
+
+class GradeRecordStore:
+    """Append-only columnar store of extracted grade records
+    
+    Extractors hand over one DataFrame batch per file; batches are kept as
+    chunks and concatenated only once, when the reports need the full table.
+    """
+    
+    def __init__(self):
+        self._chunks: list[pd.DataFrame] = []
+        self._length = 0
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def append(self, batch: pd.DataFrame):
+        """Add a batch of records with RECORD_COLUMNS"""
+        if len(batch):
+            self._chunks.append(batch[RECORD_COLUMNS])
+            self._length += len(batch)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """Return all records as a single DataFrame"""
+        if not self._chunks:
+            return records_to_frame([])
+        if len(self._chunks) > 1:
+            self._chunks = [pd.concat(self._chunks, ignore_index=True)]
+        return self._chunks[0]
+
+class RunningSummary:
+    """Report aggregates maintained batch by batch for streaming runs
+    
+    Holds one entry per (course, term) pair and per source file, so memory
+    does not grow with the number of records.
+    """
+    
+    def __init__(self):
+        self.total_records = 0
+        self.missing_student_id = 0
+        self.missing_student_name = 0
+        # (course, term) -> [count, sum, min, max, source files]
+        self.courses: dict[tuple[str, str], list] = {}
+        # source file -> [count, first course, first term]
+        self.files: dict[str, list] = {}
+    
+    def update(self, batch: pd.DataFrame):
+        """Fold one batch of records into the aggregates"""
+        if not len(batch):
+            return
+        self.total_records += len(batch)
+        self.missing_student_id += int((batch['Student_ID'] == '').sum())
+        self.missing_student_name += int((batch['Student_Name'] == '').sum())
+        
+        grouped = batch.groupby(['Course_Code', 'Term', 'Source_File'])['Grade'].agg(['count', 'sum', 'min', 'max'])
+        for (course, term, source), row in grouped.iterrows():
+            entry = self.courses.get((course, term))
+            if entry is None:
+                self.courses[(course, term)] = [row['count'], row['sum'], row['min'], row['max'], {source}]
+            else:
+                entry[0] += row['count']
+                entry[1] += row['sum']
+                entry[2] = min(entry[2], row['min'])
+                entry[3] = max(entry[3], row['max'])
+                entry[4].add(source)
+        
+        firsts = batch.groupby('Source_File', sort=False).agg({'Grade': 'count', 'Course_Code': 'first', 'Term': 'first'})
+        for source, row in firsts.iterrows():
+            entry = self.files.get(source)
+            if entry is None:
+                self.files[source] = [row['Grade'], row['Course_Code'], row['Term']]
+            else:
+                entry[0] += row['Grade']
+    
+    def summary(self) -> dict[str, int]:
+        return {
+            'Total Records': self.total_records,
+            'Unique Courses': len({course for course, _ in self.courses}),
+            'Unique Terms': len({term for _, term in self.courses}),
+            'Files Processed': len({source_file_path(source) for source in self.files}),
+            'Records Missing Student ID': self.missing_student_id,
+            'Records Missing Student Name': self.missing_student_name,
+        }
+    
+    def course_breakdown(self) -> pd.DataFrame:
+        """Same layout as the Course_Breakdown sheet of a non-streaming run"""
+        keys = sorted(self.courses)
+        columns = pd.MultiIndex.from_tuples([
+            ('Grade', 'count'), ('Grade', 'mean'), ('Grade', 'min'), ('Grade', 'max'), ('Source_File', 'nunique'),
+        ])
+        rows = [
+            [count, total / count, low, high, len(sources)]
+            for count, total, low, high, sources in (self.courses[key] for key in keys)
+        ]
+        index = pd.MultiIndex.from_tuples(keys, names=['Course_Code', 'Term'])
+        return pd.DataFrame(rows, index=index, columns=columns).round(2)
+    
+    def file_breakdown(self) -> pd.DataFrame:
+        """Same layout as the Files_Processed sheet of a non-streaming run"""
+        keys = sorted(self.files)
+        index = pd.Index(keys, name='Source_File')
+        return pd.DataFrame([self.files[key] for key in keys], index=index,
+                            columns=['Grade', 'Course_Code', 'Term'])
+
+class StreamingExport:
+    """Appends each record batch to the export CSVs as soon as it is extracted
+    
+    The files are written under hidden temporary names and only renamed to
+    their final names by commit(), so an interrupted run never leaves a
+    partial export where the SIS loader looks for it. abort() instead renames
+    them to "*.csv.partial", which the loader's "sis_import_ready_*.csv"
+    pattern does not match, so the records extracted before a crash are kept.
+    """
+    
+    def __init__(self, output_dir: Path, run_id: str):
+        self.data_file = output_dir / f"processed_grades_{run_id}.csv"
+        self.sis_file = output_dir / f"sis_import_ready_{run_id}.csv"
+        self.sis_records = 0
+        self.committed = False
+        self._data = open(temp_path(self.data_file), 'w', newline='', encoding='utf-8')
+        self._sis = open(temp_path(self.sis_file), 'w', newline='', encoding='utf-8')
+        header = records_to_frame([])
+        header.to_csv(self._data, index=False)
+        header.to_csv(self._sis, index=False)
+    
+    def write(self, batch: pd.DataFrame):
+        if not len(batch):
+            return
+        batch.to_csv(self._data, index=False, header=False)
+        sis_batch = batch[batch['Student_ID'] != '']  # Only records with student IDs
+        sis_batch.to_csv(self._sis, index=False, header=False)
+        self.sis_records += len(sis_batch)
+        # Flush per file so a crash keeps everything extracted so far
+        self._data.flush()
+        self._sis.flush()
+    
+    def close(self):
+        self._data.close()
+        self._sis.close()
+    
+    def commit(self):
+        """Close the exports and move them to their final names"""
+        self.close()
+        os.replace(temp_path(self.data_file), self.data_file)
+        os.replace(temp_path(self.sis_file), self.sis_file)
+        self.committed = True
+    
+    def abort(self) -> list[Path]:
+        """Close the exports and keep what was written as clearly marked partial files"""
+        self.close()
+        kept = []
+        for path in (self.data_file, self.sis_file):
+            if not temp_path(path).exists():
+                continue  # Already committed under its final name
+            partial = path.with_name(f"{path.name}.partial")
+            try:
+                os.replace(temp_path(path), partial)
+                kept.append(partial)
+            except OSError as e:
+                logger.error(f"Could not keep partial export {temp_path(path)}: {e}")
+        return kept
+
+# One row of a printed class roster: optional name, student ID, component
+# scores (possibly with per-component letter grades), then the final score,
+# its letter grade and optional free-text notes
+ROSTER_ROW_PATTERN = re.compile(
+    r'^(?P<name>\D*?)\s*(?P<student_id>\d{3,6})\s+'
+    r'(?:(?:-?\d+(?:\.\d+)?|-|[A-F][+-]?)\s+)*?'
+    r'(?P<grade>\d+(?:\.\d+)?)\s+[A-F][+-]?'
+    r'(?:\s+[^\d\s-].*)?\s*$'
+)
+
+# Score column headings of a roster, e.g. "FINAL SCORE" or "GRAMMAR SCORE"
+SCORE_HEADING_PATTERN = re.compile(r'\b([A-Z]{3,})\s+SCORE\b')
+# Headings that mark a roster's overall class grade column
+FINAL_SCORE_HEADINGS = {'FINAL', 'TOTAL'}
+
+def is_multi_course_roster(text: str) -> bool:
+    """Whether a roster page scores two or more courses side by side with no final column
+    
+    e.g. the IEAP-4 rosters with GRAMMAR and WRITING scores: taking the last
+    score of such a row as the class grade would silently pick one course.
+    """
+    headings = set(SCORE_HEADING_PATTERN.findall(text))
+    return len(headings) > 1 and not headings & FINAL_SCORE_HEADINGS
+
+# Programs whose class codes start roster filenames
+CLASS_PROGRAMS = ('EHSS', 'GESL', 'IEAP')
+
+# Class code at the start of a roster filename: a known program followed by a
+# numeric level and optional section ("EHSS-04", "GESL-5", "EHSS-07-A",
+# "IEAP-4G") or by a word level ("GESL-PB2", "EHSS-Pre-B1", "IEAP-BEG"), or a
+# standalone pre-level class ("PREB2", "PRE-B2"). Word levels must end in a
+# digit unless they are a known word, so "IEAP Term ..." has no class code. A
+# code with a word attached ("EHSS-01-PRO", "PREB2-SMART") names a sub-course
+# and has no class code either.
+CLASS_CODE_PATTERN = re.compile(
+    r'^\s*(?:'
+    r'(?P<program>' + '|'.join(CLASS_PROGRAMS) + r')[\s_-]*'
+    r'(?:(?P<level>\d{1,2})(?:-?(?P<section>[A-Z]))?'
+    r'|(?P<word>(?:PRE[\s_-]?)?[A-Z]{1,2}\d|BEG(?:INNER)?))'
+    r'|(?P<standalone>PRE[\s_-]?B\d)'
+    r')(?![A-Za-z0-9]|[_-][A-Za-z])',
+    re.IGNORECASE
+)
+
+SPREADSHEET_SUFFIXES = {'.xlsx', '.xls', '.csv'}
+
+def normalize_class_token(token: str) -> str:
+    """Upper-case a word level and drop its separators, so "Pre-B2" and "PREB2" agree"""
+    return re.sub(r'[\s_-]', '', token).upper()
+
+def class_code_key(filepath: Path) -> tuple[str, int | None, str] | None:
+    """Normalized class code of a roster file, so "GESL-05 ..." and "GESL-5 ..." agree
+    
+    None means the filename has no recognizable class code; such files are
+    never skipped in favour of another source.
+    """
+    match = CLASS_CODE_PATTERN.match(filepath.stem)
+    if not match:
+        return None
+    if match.group('standalone'):
+        return normalize_class_token(match.group('standalone')), None, ''
+    program = match.group('program').upper()
+    if match.group('word'):
+        return program, None, normalize_class_token(match.group('word'))
+    return program, int(match.group('level')), (match.group('section') or '').upper()
+
+# Roster date in a filename: "03 April 2024", "9 Jan 2024", "January 23",
+# "17 Feb" or "28-06-21"
+MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+ROSTER_DATE_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9])(?:(?P<day>\d{1,2})\s+)?'
+    r'(?P<month>' + '|'.join(MONTHS) + r')[a-z]*\.?'
+    r'(?:\s+(?P<year>\d{4}|\d{2}))?(?![A-Za-z0-9])'
+    r'|(?<![0-9])(?P<numeric>\d{1,2}-\d{1,2}-(?:\d{4}|\d{2}))(?![0-9])',
+    re.IGNORECASE
+)
+
+def roster_date(filepath: Path) -> tuple[int | None, int, int | None] | None:
+    """(year, month, day) named in a roster filename, with None for a missing year or day"""
+    # Searched after the class code, so the "1" of "EHSS-1 May 2024" is not taken as the day
+    code = CLASS_CODE_PATTERN.match(filepath.stem)
+    match = ROSTER_DATE_PATTERN.search(filepath.stem, code.end() if code else 0)
+    if not match:
+        return None
+    if match.group('numeric'):
+        day, month, year = (int(part) for part in match.group('numeric').split('-'))
+    else:
+        day = int(match.group('day')) if match.group('day') else None
+        month = MONTHS.index(match.group('month').lower()[:3]) + 1
+        year = int(match.group('year')) if match.group('year') else None
+    if year is not None and year < 100:
+        year += 2000
+    return year, month, day
+
+def plan_sources(files: list[Path]) -> dict[Path, list[Path]]:
+    """Find the spreadsheets that may replace each PDF roster
+    
+    Files are grouped by (folder, class code, roster date). Returns, for every
+    PDF whose group also has .xlsx/.xls/.csv files, those spreadsheets in the
+    original order. The PDF should only be skipped once one of them has
+    actually produced records.
+    """
+    spreadsheets: dict[tuple, list[Path]] = {}
+    for filepath in files:
+        key = class_code_key(filepath)
+        if key is not None and filepath.suffix.lower() in SPREADSHEET_SUFFIXES:
+            spreadsheets.setdefault((filepath.parent, key, roster_date(filepath)), []).append(filepath)
+    
+    twins: dict[Path, list[Path]] = {}
+    for filepath in files:
+        key = class_code_key(filepath)
+        if filepath.suffix.lower() == '.pdf' and key is not None:
+            replacements = spreadsheets.get((filepath.parent, key, roster_date(filepath)))
+            if replacements:
+                twins[filepath] = replacements
+    return twins
+
+# PDFs with fewer pages than this are not worth splitting across processes
+PDF_PARALLEL_MIN_PAGES = 2
+
+class PdfTextCache:
+    """Persistent per-page text of PDFs, keyed by the SHA-256 of their bytes
+    
+    Identical PDFs (including the duplicates under the "copy" folders) share
+    one entry, so each distinct PDF is only ever run through pypdf once.
+    """
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _entry_path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.json"
+    
+    def get(self, digest: str) -> list[str] | None:
+        """Return cached page texts, or None when missing or written by another pypdf version"""
+        try:
+            with open(self._entry_path(digest), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        import pypdf
+        if entry.get('pypdf') != pypdf.__version__:
+            return None
+        return entry['pages']
+    
+    def put(self, digest: str, pages: list[str]):
+        """Store page texts atomically; concurrent writers of the same entry are harmless"""
+        path = self._entry_path(digest)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        import pypdf
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'pypdf': pypdf.__version__, 'pages': pages}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write PDF text cache entry {path}: {e}")
+
+def _extract_pdf_page_range(data: bytes, start: int, stop: int) -> list[str]:
+    """Extract text from pages [start, stop) of an in-memory PDF"""
+    import pypdf
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+# Bump whenever extraction logic changes so manifests from older runs are discarded
+MANIFEST_VERSION = 8
+
+class RunManifest:
+    """Persistent per-file extraction results for incremental runs
+    
+    Entries are keyed by path and validated against the file's size, mtime and
+    SHA-256. A file whose size and mtime are unchanged is reused without being
+    read; if only the mtime moved, the content hash decides.
+    """
+    
+    def __init__(self, manifest_path: Path):
+        self.path = Path(manifest_path)
+        self.entries: dict[str, dict] = {}
+        self.load()
+    
+    def load(self):
+        """Load entries from disk, ignoring missing or incompatible manifests"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            logger.info(f"Manifest {self.path} was written by an older extractor; re-parsing all files")
+            return
+        self.entries = data.get('files', {})
+    
+    @staticmethod
+    def hash_file(filepath: Path) -> str:
+        """SHA-256 of the file's bytes"""
+        hash_sha256 = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hash_sha256.update(chunk)
+        return hash_sha256.hexdigest()
+    
+    def lookup(self, filepath: Path) -> pd.DataFrame | None:
+        """Return the stored records for an unchanged file, or None if it must be parsed"""
+        entry = self.entries.get(str(filepath))
+        if entry is None:
+            return None
+        try:
+            stat = filepath.stat()
+            if entry['size'] != stat.st_size:
+                return None
+            if entry['mtime'] != stat.st_mtime_ns:
+                if entry['sha256'] != self.hash_file(filepath):
+                    return None
+                entry['mtime'] = stat.st_mtime_ns
+        except OSError as e:
+            logger.debug(f"Manifest lookup failed for {filepath}: {e}")
+            return None
+        return pd.DataFrame(entry['records'], columns=RECORD_COLUMNS)
+    
+    def update(self, filepath: Path, batch: pd.DataFrame):
+        """Store freshly extracted records for a file"""
+        try:
+            stat = filepath.stat()
+            self.entries[str(filepath)] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'sha256': self.hash_file(filepath),
+                'records': batch.to_dict(orient='list'),
+            }
+        except OSError as e:
+            logger.warning(f"Could not add {filepath} to manifest: {e}")
+    
+    def save(self, files: list[Path]):
+        """Write the manifest atomically, dropping entries for files no longer present"""
+        keep = {str(filepath) for filepath in files}
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keep}
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved manifest with {len(self.entries)} files to {self.path}")
+
+class CourseTermResolver:
+    """Resolve course code and term from file paths
+    
+    Patterns are compiled once and the filename stem is searched before the
+    folders. Matches are cached per stem and per directory, so files sharing a
+    folder or a name cost only dictionary lookups.
+    """
+    
+    course_patterns = [
+        r'([A-Z]{2,4}[-_]?\d{2,4})',  # ENGL-101, MATH101, etc.
+        r'([A-Z]{2,4}\s?\d{2,4})',    # ENGL 101, MATH 101
+    ]
+    
+    term_patterns = [
+        r'(spring|summer|fall|winter)\s?(\d{4})',
+        r'(\d{4})\s?(spring|summer|fall|winter)',
+        r'(semester\s?\d)',
+        r'(term\s?\d)'
+    ]
+    
+    def __init__(self):
+        self.course_regexes = [re.compile(p, re.IGNORECASE) for p in self.course_patterns]
+        self.term_regexes = [re.compile(p, re.IGNORECASE) for p in self.term_patterns]
+        # text -> (first match per course pattern, first match per term pattern)
+        self.stem_matches: dict[str, tuple[list, list]] = {}
+        self.dir_matches: dict[Path, tuple[list, list]] = {}
+        self.resolved: dict[Path, dict[str, str]] = {}
+    
+    def _match(self, text: str) -> tuple[list, list]:
+        courses = [m.group(1).upper().replace('_', '-') if (m := r.search(text)) else None
+                   for r in self.course_regexes]
+        terms = [m.group(0).upper() if (m := r.search(text)) else None
+                 for r in self.term_regexes]
+        return courses, terms
+    
+    def resolve(self, filepath: Path) -> dict[str, str]:
+        """Return {"course_code", "term"} for a file, "UNKNOWN" where nothing matches"""
+        info = self.resolved.get(filepath)
+        if info is not None:
+            return info
+        
+        stem = self.stem_matches.get(filepath.stem)
+        if stem is None:
+            stem = self.stem_matches[filepath.stem] = self._match(filepath.stem)
+        folder = self.dir_matches.get(filepath.parent)
+        if folder is None:
+            folder = self.dir_matches[filepath.parent] = self._match(' '.join(filepath.parent.parts))
+        
+        # Patterns are tried in order; within a pattern the filename wins over the folders
+        course_code = next((s or d for s, d in zip(stem[0], folder[0]) if s or d), "UNKNOWN")
+        term = next((s or d for s, d in zip(stem[1], folder[1]) if s or d), "UNKNOWN")
+        
+        info = self.resolved[filepath] = {"course_code": course_code, "term": term}
+        return info
+    
+    def resolve_sheet(self, filepath: Path, sheet_name: str) -> dict[str, str]:
+        """Like resolve(), but a course or term named by the worksheet wins over the file's
+        
+        Only worksheets named after a class ("EHSS-04", "GESL-PB2 2023") can
+        override; generic names such as "Sheet12" keep the file's course and term.
+        """
+        info = self.resolve(filepath)
+        if not CLASS_CODE_PATTERN.match(sheet_name):
+            return dict(info)
+        sheet = self.stem_matches.get(sheet_name)
+        if sheet is None:
+            sheet = self.stem_matches[sheet_name] = self._match(sheet_name)
+        return {
+            "course_code": next((c for c in sheet[0] if c), info["course_code"]),
+            "term": next((t for t in sheet[1] if t), info["term"]),
+        }
+    
+    def resolve_all(self, files: list[Path]):
+        """Resolve a whole file list up front so per-file lookups are cache hits"""
+        for filepath in files:
+            self.resolve(filepath)
+
 class GradeProcessor:
-    def __init__(self, input_directory: str, output_directory: str):
+    def __init__(self, input_directory: str, output_directory: str, jobs: int = 1,
+                 manifest_path: str | None = None, stream: bool = False,
+                 excel_engine: str = 'auto', pdf_cache_dir: str | None = None,
+                 pdf_page_jobs: int = 1, prefer_spreadsheets: bool = True,
+                 output_format: str = 'xlsx', profile: bool = False):
         self.input_dir = Path(input_directory)
         self.output_dir = Path(output_directory)
         self.output_dir.mkdir(exist_ok=True)
+        self.jobs = jobs
+        self.manifest = RunManifest(manifest_path) if manifest_path else None
+        self.stream = stream
+        self.excel_engine = resolve_excel_engine(excel_engine)
+        self.pdf_cache = PdfTextCache(pdf_cache_dir) if pdf_cache_dir else None
+        # Page-level PDF parallelism; only used when files are processed serially
+        self.pdf_page_jobs = pdf_page_jobs
+        self.page_pool: ProcessPoolExecutor | None = None
+        self.prefer_spreadsheets = prefer_spreadsheets
+        self.output_format = output_format
+        # Shared by every output of the run so its files can be matched up
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.profiler = RunProfiler(profile)
+        # (PDF, spreadsheet of the same class parsed instead)
+        self.skipped_pdfs: list[tuple[Path, Path]] = []
+        # Content kind of each discovered file, and files rejected before parsing
+        self.file_kinds: dict[Path, str] = {}
+        self.rejected_files: list[tuple[Path, str]] = []
+        # Virtual paths (archive.zip/member) of grade files read from zip archives
+        self.zip_members: dict[Path, ZipMember] = {}
+        self.already_extracted: list[Path] = []
+        # Files whose extraction raised or could not parse them; never stored in the manifest
+        self.failed_files: set[Path] = set()
+        # Exports from the same batch share a delimiter: directory -> delimiter,
+        # used to break ties when sniffing. The encoding is never cached
+        self.csv_delimiters: dict[Path, str] = {}
         
         # Common column patterns to look for
         self.grade_column_patterns = [
@@ -62,325 +829,691 @@ class GradeProcessor:
             r'surname'
         ]
         
-        self.processed_records: list[GradeRecord] = []
+        # Patterns for each column role, tried against lower-cased headers
+        self.column_role_patterns: dict[str, list[str]] = {
+            'grade': self.grade_column_patterns,
+            'student_id': self.student_id_patterns,
+            # For student names, try to find first/last name or full name
+            'first_name': [r'first.*name'],
+            'last_name': [r'last.*name', r'surname'],
+            'full_name': [r'full.*name', r'^name$'],
+        }
+        self.course_resolver = CourseTermResolver()
+        
+        # Moodle exports share headers, so detection results are memoized per header tuple
+        self.header_cache: dict[tuple[str, ...], DetectedColumns] = {}
+        
+        self.processed_records = GradeRecordStore()
+        # Streaming runs keep only aggregates instead of the records themselves
+        self.running_summary = RunningSummary() if stream else None
         
+    def __getstate__(self):
+        # Worker processes only need the configuration, not accumulated run state
+        state = self.__dict__.copy()
+        state['processed_records'] = GradeRecordStore()
+        state['running_summary'] = None
+        state['manifest'] = None
+        state['page_pool'] = None
+        state['failed_files'] = set()
+        state['profiler'] = RunProfiler(self.profiler.enabled)
+        return state
+    
+    @property
+    def record_count(self) -> int:
+        """Number of records extracted so far"""
+        if self.running_summary is not None:
+            return self.running_summary.total_records
+        return len(self.processed_records)
+    
     def find_files(self) -> list[Path]:
-        """Find all grade files in directory structure"""
-        supported_extensions = ['.xlsx', '.csv', '.xls', '.pdf']
-        files = []
+        """Find all grade files in directory structure
         
-        for root, dirs, filenames in os.walk(self.input_dir):
-            for filename in filenames:
-                if any(filename.lower().endswith(ext) for ext in supported_extensions):
-                    files.append(Path(root) / filename)
+        Candidates are classified from their first bytes; AppleDouble files,
+        lock files, empty files and files whose content does not match their
+        extension are recorded in rejected_files instead of being returned.
+        Members of zip archives are returned as virtual "archive.zip/member"
+        paths unless an extracted copy already sits next to the archive.
+        """
+        found = discover_files(self.input_dir)
+        self.file_kinds.update(found.kinds)
+        self.zip_members.update(found.zip_members)
+        self.rejected_files = found.rejected
+        self.already_extracted = found.already_extracted
+        for filepath, reason in found.rejected:
+            logger.debug(f"Rejected {filepath}: {reason}")
         
-        logger.info(f"Found {len(files)} files to process")
-        return files
+        logger.info(f"Found {len(found.files)} files to process ({len(found.zip_members)} inside zip archives, "
+                    f"{len(found.rejected)} rejected before parsing)")
+        return found.files
     
     def detect_column(self, df: pd.DataFrame, patterns: list[str]) -> str | None:
         """Detect column using regex patterns"""
+        regex = compile_column_patterns(tuple(patterns))
         for col in df.columns:
-            col_lower = str(col).lower()
-            for pattern in patterns:
-                if re.search(pattern, col_lower):
-                    return col
+            if regex.search(str(col).lower()):
+                return col
         return None
     
-    def extract_course_info(self, filepath: Path) -> dict[str, str]:
-        """Extract course and term info from file path and name"""
-        path_parts = filepath.parts
-        filename = filepath.stem
-        
-        # Try to extract course code from filename or path
-        course_patterns = [
-            r'([A-Z]{2,4}[-_]?\d{2,4})',  # ENGL-101, MATH101, etc.
-            r'([A-Z]{2,4}\s?\d{2,4})',    # ENGL 101, MATH 101
-        ]
-        
-        term_patterns = [
-            r'(spring|summer|fall|winter)\s?(\d{4})',
-            r'(\d{4})\s?(spring|summer|fall|winter)',
-            r'(semester\s?\d)',
-            r'(term\s?\d)'
-        ]
-        
-        course_code = "UNKNOWN"
-        term = "UNKNOWN"
+    def detect_columns(self, columns: pd.Index) -> DetectedColumns:
+        """Find the column for every role in a single pass over the headers"""
+        header = tuple(columns)
+        detected = self.header_cache.get(header)
+        if detected is not None:
+            return detected
         
-        # Check filename and path for course code
-        search_text = f"{filename} {' '.join(path_parts)}"
-        for pattern in course_patterns:
-            match = re.search(pattern, search_text, re.IGNORECASE)
-            if match:
-                course_code = match.group(1).upper().replace('_', '-')
-                break
-        
-        # Check for term
-        for pattern in term_patterns:
-            match = re.search(pattern, search_text, re.IGNORECASE)
-            if match:
-                term = match.group(0).upper()
+        regexes = {role: compile_column_patterns(tuple(patterns))
+                   for role, patterns in self.column_role_patterns.items()}
+        found: dict[str, str] = {}
+        for col in header:
+            col_lower = str(col).lower()
+            for role, regex in regexes.items():
+                if role not in found and regex.search(col_lower):
+                    found[role] = col
+            if len(found) == len(regexes):
                 break
         
-        return {"course_code": course_code, "term": term}
+        detected = DetectedColumns(**{role: found.get(role) for role in regexes})
+        self.header_cache[header] = detected
+        return detected
     
-    def process_excel_file(self, filepath: Path) -> list[GradeRecord]:
-        """Process Excel files (.xlsx, .xls)"""
-        records: list[GradeRecord] = []
+    def extract_course_info(self, filepath: Path) -> dict[str, str]:
+        """Extract course and term info from file path and name"""
+        return dict(self.course_resolver.resolve(filepath))
+    
+    def process_excel_file(self, filepath: Path, data: bytes | None = None) -> pd.DataFrame:
+        """Process Excel files (.xlsx, .xls)
+        
+        The workbook is parsed once and every sheet with a grade column is
+        extracted. Records from multi-sheet workbooks carry the sheet name in
+        their source ("path::sheet"). ``data`` holds the bytes of an archive
+        member that was already read.
+        """
+        batch = records_to_frame([])
         
         try:
-            # Try reading with different engines
-            try:
-                df = pd.read_excel(filepath, engine='openpyxl')
-            except Exception as e_openpyxl:
-                logger.debug(f"Failed to read Excel {filepath} with openpyxl: {e_openpyxl}")
-                df = pd.read_excel(filepath, engine='xlrd')
+            with self.profiler.stage('excel_read', filepath):
+                sheets = self.read_excel(filepath, sheet_name=None, data=data)
             
-            course_info = self.extract_course_info(filepath)
-            records.extend(self.extract_grades_from_dataframe(df, filepath, course_info))
+            if len(sheets) == 1:
+                df = next(iter(sheets.values()))
+                course_info = self.extract_course_info(filepath)
+                return self.extract_grades_from_dataframe(df, filepath, course_info)
+            
+            batches = []
+            for sheet_name, df in sheets.items():
+                df.columns = df.columns.astype(str).str.strip()
+                if df.empty or not self.detect_columns(df.columns).grade:
+                    logger.debug(f"Skipping sheet without grades: {filepath} [{sheet_name}]")
+                    continue
+                course_info = self.course_resolver.resolve_sheet(filepath, str(sheet_name))
+                batches.append(self.extract_grades_from_dataframe(
+                    df, filepath, course_info, source=f"{filepath}{SHEET_SOURCE_SEPARATOR}{sheet_name}"))
+            
+            if batches:
+                batch = pd.concat(batches, ignore_index=True)
+            else:
+                logger.warning(f"No grade column found in any sheet of {filepath}")
             
         except Exception as e:
             logger.error(f"Error processing Excel file {filepath}: {e}")
+            self.failed_files.add(filepath)
         
-        return records
+        return batch
+    
+    def read_excel(self, filepath: Path, sheet_name: int | str | None = 0, data: bytes | None = None):
+        """Read a workbook with the configured backend, falling back to xlrd for legacy .xls"""
+        if self.excel_engine == 'openpyxl' and self.file_kinds.get(filepath) == 'ole':
+            # openpyxl cannot open OLE2 workbooks, so don't let it try
+            return pd.read_excel(self.open_source(filepath, data), engine='xlrd', sheet_name=sheet_name)
+        try:
+            return EXCEL_READERS[self.excel_engine](self.open_source(filepath, data), sheet_name=sheet_name)
+        except Exception as e_engine:
+            logger.debug(f"Failed to read Excel {filepath} with {self.excel_engine}: {e_engine}")
+            return pd.read_excel(self.open_source(filepath, data), engine='xlrd', sheet_name=sheet_name)
+    
+    def open_source(self, filepath: Path, data: bytes | None = None):
+        """The path to hand to a reader, or an in-memory stream of bytes already read or of a zip archive member"""
+        if data is not None:
+            return io.BytesIO(data)
+        return open_source(filepath, self.zip_members)
     
-    def process_csv_file(self, filepath: Path) -> list[GradeRecord]:
+    def process_csv_file(self, filepath: Path, data: bytes | None = None) -> pd.DataFrame:
         """Process CSV files"""
-        records: list[GradeRecord] = []
+        batch = records_to_frame([])
         
         try:
-            # Try different encodings and separators
-            encodings = ['utf-8', 'latin-1', 'cp1252']
-            separators = [',', ';', '\t']
-            
-            df = None
-            for encoding in encodings:
-                for sep in separators:
-                    try:
-                        df = pd.read_csv(filepath, encoding=encoding, sep=sep)
-                        if len(df.columns) > 1:  # Successfully parsed
-                            break
-                    except Exception as e:
-                        logger.debug(f"CSV parsing attempt with encoding {encoding} and separator '{sep}' failed for {filepath}: {e}")
-                        continue
-                if df is not None and len(df.columns) > 1:
-                    break
+            with self.profiler.stage('csv_read', filepath):
+                df = self.read_csv(filepath, data)
             
             if df is None:
                 logger.error(f"Could not parse CSV file: {filepath}")
-                return records
+                self.failed_files.add(filepath)
+                return batch
 
             # Log the number of columns in the CSV file
             num_columns = len(df.columns)
             logger.info(f"CSV file {filepath} has {num_columns} columns.")
             
             course_info = self.extract_course_info(filepath)
-            records.extend(self.extract_grades_from_dataframe(df, filepath, course_info))
+            batch = self.extract_grades_from_dataframe(df, filepath, course_info)
             
         except Exception as e:
             logger.error(f"Error processing CSV file {filepath}: {e}")
+            self.failed_files.add(filepath)
         
-        return records
+        return batch
+    
+    def read_csv(self, filepath: Path, data: bytes | None = None) -> pd.DataFrame | None:
+        """Parse a CSV file once, with the dialect sniffed from its own first bytes
+        
+        The delimiter last used in the same directory only breaks ties, so the
+        result never depends on which files were read before this one.
+        """
+        with self.profiler.stage('csv_sniff', filepath):
+            head = data[:CSV_SNIFF_BYTES] if data is not None else self.read_csv_head(filepath)
+            encoding = sniff_csv_encoding(head)
+            delimiter = sniff_csv_delimiter(head, encoding, self.csv_delimiters.get(filepath.parent))
+        
+        df = self._parse_csv(filepath, encoding, delimiter, data)
+        if df is None and encoding == 'utf-8':
+            # Invalid UTF-8 further into the file than the sniffed sample
+            with self.profiler.stage('csv_retry', filepath):
+                df = self._parse_csv(filepath, 'latin-1', delimiter, data)
+        
+        if df is not None:
+            self.csv_delimiters[filepath.parent] = delimiter
+        return df
+    
+    def read_csv_head(self, filepath: Path) -> bytes:
+        """The first CSV_SNIFF_BYTES of a CSV file on disk or inside an archive"""
+        if filepath in self.zip_members:
+            return read_source_bytes(filepath, self.zip_members)[:CSV_SNIFF_BYTES]
+        with open(filepath, 'rb') as f:
+            return f.read(CSV_SNIFF_BYTES)
+    
+    def _parse_csv(self, filepath: Path, encoding: str, sep: str, data: bytes | None = None) -> pd.DataFrame | None:
+        try:
+            return pd.read_csv(self.open_source(filepath, data), encoding=encoding, sep=sep)
+        except Exception as e:
+            logger.debug(f"CSV parsing with encoding {encoding} and separator '{sep}' failed for {filepath}: {e}")
+            return None
     
-    def process_pdf_file(self, filepath: Path) -> list[GradeRecord]:
-        """Process PDF files (basic text extraction)"""
+    def process_pdf_file(self, filepath: Path, data: bytes | None = None) -> pd.DataFrame:
+        """Process PDF files: one record per roster row, page by page"""
         records: list[GradeRecord] = []
         
         try:
-            with open(filepath, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
+            course_info = self.extract_course_info(filepath)
+            has_text = False
+            # Text is only kept for the single-student fallback until a roster row shows up
+            fallback_text: list[str] | None = []
             
-            if not text:
-                logger.warning(f"Could not extract text from PDF: {filepath}")
-                return []
-
-            # Simplified extraction - assumes one student per PDF or very simple structure
-            # This part needs significant improvement for real-world PDFs
-            # Example: Look for student ID and grade patterns in the whole text
+            for page_number, page_text in enumerate(self.iter_pdf_pages(filepath, data)):
+                has_text = has_text or bool(page_text)
+                if page_number == 0 and is_multi_course_roster(page_text):
+                    logger.warning(f"Skipping PDF roster with several course scores and no final grade: {filepath}")
+                    return records_to_frame([])
+                with self.profiler.stage('row_extraction', filepath):
+                    records.extend(self.extract_roster_rows(page_text, filepath, course_info))
+                if records:
+                    fallback_text = None
+                elif fallback_text is not None:
+                    fallback_text.append(page_text)
             
-            student_id_match = re.search(r"Student ID: (\w+)", text, re.IGNORECASE)
-            grade_match = re.search(r"Final Grade: (\d+\.?\d*)", text, re.IGNORECASE)
-            student_name_match = re.search(r"Student Name: ([\w\s]+)", text, re.IGNORECASE)
-
-            student_id = student_id_match.group(1) if student_id_match else ""
-            grade_str = grade_match.group(1) if grade_match else ""
-            student_name = student_name_match.group(1).strip() if student_name_match else ""
+            if not has_text:
+                logger.warning(f"Could not extract text from PDF: {filepath}")
+                return records_to_frame(records)
             
-            course_info = self.extract_course_info(filepath)
-
-            if student_id and grade_str:
-                try:
-                    grade = float(grade_str)
-                    records.append(GradeRecord(
-                        student_id=student_id,
-                        student_name=student_name,
-                        course_code=course_info.get("course_code", "UNKNOWN"),
-                        grade=grade,
-                        term=course_info.get("term", "UNKNOWN"),
-                        file_source=str(filepath)
-                    ))
-                except ValueError:
-                    logger.warning(f"Could not parse grade '{grade_str}' as float in PDF {filepath}")
+            if fallback_text is not None:
+                records.extend(self.extract_single_pdf_record("".join(fallback_text), filepath, course_info))
+            if not records:
+                logger.warning(f"No roster rows found in PDF: {filepath}")
         except Exception as e:
             logger.error(f"Error processing PDF {filepath}: {e}")
+            self.failed_files.add(filepath)
         
-        return records
-
-    def extract_grades_from_dataframe(self, df: pd.DataFrame, filepath: Path, course_info: dict) -> list[GradeRecord]:
-        """Extract grade records from a pandas DataFrame"""
+        return records_to_frame(records)
+    
+    def extract_roster_rows(self, text: str, filepath: Path, course_info: dict) -> list[GradeRecord]:
+        """Extract one record per roster row found in a page of text"""
         records: list[GradeRecord] = []
+        for line in text.splitlines():
+            match = ROSTER_ROW_PATTERN.match(line)
+            if not match:
+                continue
+            records.append(GradeRecord(
+                student_id=match.group('student_id'),
+                student_name=match.group('name').strip(),
+                course_code=course_info["course_code"],
+                grade=float(match.group('grade')),
+                term=course_info["term"],
+                file_source=str(filepath)
+            ))
+        return records
+    
+    def extract_single_pdf_record(self, text: str, filepath: Path, course_info: dict) -> list[GradeRecord]:
+        """Fallback for single-student PDFs with labelled "Student ID:" / "Final Grade:" fields"""
+        student_id_match = re.search(r"Student ID: (\w+)", text, re.IGNORECASE)
+        grade_match = re.search(r"Final Grade: (\d+\.?\d*)", text, re.IGNORECASE)
+        student_name_match = re.search(r"Student Name: ([\w\s]+)", text, re.IGNORECASE)
+        
+        student_id = student_id_match.group(1) if student_id_match else ""
+        grade_str = grade_match.group(1) if grade_match else ""
+        student_name = student_name_match.group(1).strip() if student_name_match else ""
+        
+        if not (student_id and grade_str):
+            return []
+        try:
+            grade = float(grade_str)
+        except ValueError:
+            logger.warning(f"Could not parse grade '{grade_str}' as float in PDF {filepath}")
+            return []
+        return [GradeRecord(
+            student_id=student_id,
+            student_name=student_name,
+            course_code=course_info.get("course_code", "UNKNOWN"),
+            grade=grade,
+            term=course_info.get("term", "UNKNOWN"),
+            file_source=str(filepath)
+        )]
+    
+    def iter_pdf_pages(self, filepath: Path, data: bytes | None = None) -> Iterator[str]:
+        """Yield the text of each page, from the text cache when the PDF was seen before
+        
+        Time spent producing pages (reading, hashing, extracting) is profiled as
+        pdf_text; time the caller spends between pages is not.
+        """
+        start = time.perf_counter()
+        if data is None:
+            data = read_source_bytes(filepath, self.zip_members)
+        
+        digest = None
+        if self.pdf_cache is not None:
+            digest = hashlib.sha256(data).hexdigest()
+            pages = self.pdf_cache.get(digest)
+            if pages is not None:
+                logger.debug(f"PDF text cache hit for {filepath}")
+                self.profiler.add('pdf_text', filepath, time.perf_counter() - start)
+                yield from pages
+                return
+        
+        import pypdf
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        page_count = len(reader.pages)
+        if self.page_pool is not None and page_count >= PDF_PARALLEL_MIN_PAGES:
+            # Contiguous page ranges, one per worker, reassembled in page order
+            workers = min(self.pdf_page_jobs, page_count)
+            bounds = [page_count * i // workers for i in range(workers + 1)]
+            chunks = self.page_pool.map(_extract_pdf_page_range, [data] * workers, bounds[:-1], bounds[1:])
+            pages = (text for chunk in chunks for text in chunk)
+        else:
+            pages = (page.extract_text() for page in reader.pages)
+        
+        # The cache needs every page; otherwise pages are handed on one at a time
+        collected: list[str] | None = [] if self.pdf_cache is not None else None
+        text_seconds = 0.0
+        for text in pages:
+            text_seconds += time.perf_counter() - start
+            if collected is not None:
+                collected.append(text)
+            yield text
+            start = time.perf_counter()
+        
+        if collected is not None:
+            self.pdf_cache.put(digest, collected)
+        self.profiler.add('pdf_text', filepath, text_seconds + time.perf_counter() - start)
+    
+    def extract_grades_from_dataframe(self, df: pd.DataFrame, filepath: Path, course_info: dict,
+                                      source: str | None = None) -> pd.DataFrame:
+        """Extract a batch of grade records from a pandas DataFrame
+        
+        ``source`` overrides the Source_File value (defaults to the file path).
+        """
         
         # Clean column names
         df.columns = df.columns.astype(str).str.strip()
         
         # Find relevant columns
-        grade_col = self.detect_column(df, self.grade_column_patterns)
-        student_id_col = self.detect_column(df, self.student_id_patterns)
-        
-        # For student names, try to find first/last name or full name
-        first_name_col = self.detect_column(df, [r'first.*name'])
-        last_name_col = self.detect_column(df, [r'last.*name', r'surname'])
-        full_name_col = self.detect_column(df, [r'full.*name', r'^name$'])
+        with self.profiler.stage('column_detection', filepath):
+            columns = self.detect_columns(df.columns)
+        grade_col = columns.grade
+        student_id_col = columns.student_id
+        first_name_col = columns.first_name
+        last_name_col = columns.last_name
+        full_name_col = columns.full_name
         
         if not grade_col:
             logger.warning(f"No grade column found in {filepath}")
             # List available columns for manual review
             logger.info(f"Available columns: {list(df.columns)}")
-            return records
+            return records_to_frame([])
         
         logger.info(f"Processing {filepath}: Grade column='{grade_col}', ID column='{student_id_col}'")
+        start = time.perf_counter()
         
-        for index, row in df.iterrows():
-            try:
-                # Get grade
-                grade_value = row[grade_col]
-                if pd.isna(grade_value):
-                    continue
-                
-                # Try to convert to float
-                if isinstance(grade_value, str):
-                    # Remove % sign and other characters
-                    grade_clean = re.sub(r'[^\d.-]', '', grade_value)
-                    if not grade_clean:
-                        continue
-                    grade_float = float(grade_clean)
-                else:
-                    grade_float = float(grade_value)
-                
-                # Get student ID
-                student_id = ""
-                if student_id_col and not pd.isna(row[student_id_col]):
-                    student_id = str(row[student_id_col])
-                
-                # Get student name
-                student_name = ""
-                if first_name_col and last_name_col:
-                    first = row.get(first_name_col, "")
-                    last = row.get(last_name_col, "")
-                    student_name = f"{first} {last}".strip()
-                elif full_name_col and not pd.isna(row[full_name_col]):
-                    student_name = str(row[full_name_col])
-                
-                if student_name or student_id:  # Need at least one identifier
-                    records.append(GradeRecord(
-                        student_id=student_id,
-                        student_name=student_name,
-                        course_code=course_info["course_code"],
-                        grade=grade_float,
-                        term=course_info["term"],
-                        file_source=str(filepath)
-                    ))
-                
-            except (ValueError, TypeError) as e:
-                logger.debug(f"Skipping row {index} in {filepath}: {e}")
-                continue
+        # Grades: rows without a parseable grade are NaN and get skipped
+        grades = self.clean_grade_column(df[grade_col])
         
-        return records
+        # Student IDs: missing IDs become empty strings
+        if student_id_col:
+            ids = df[student_id_col]
+            student_ids = ids.astype(str).where(ids.notna(), "")
+        else:
+            student_ids = pd.Series("", index=df.index)
+        
+        # Student names: first + last when both columns exist, otherwise full name
+        if first_name_col and last_name_col:
+            first = df[first_name_col].astype(str).fillna("nan")
+            last = df[last_name_col].astype(str).fillna("nan")
+            student_names = (first + " " + last).str.strip()
+        elif full_name_col:
+            names = df[full_name_col]
+            student_names = names.astype(str).where(names.notna(), "")
+        else:
+            student_names = pd.Series("", index=df.index)
+        
+        # Need a grade and at least one identifier
+        keep = grades.notna() & ((student_ids != "") | (student_names != ""))
+        skipped = len(df) - int(keep.sum())
+        if skipped:
+            logger.debug(f"Skipping {skipped} rows without a usable grade or identifier in {filepath}")
+        
+        batch = pd.DataFrame({
+            'Student_ID': student_ids[keep],
+            'Student_Name': student_names[keep],
+            'Course_Code': course_info["course_code"],
+            'Grade': grades[keep],
+            'Term': course_info["term"],
+            'Source_File': source or str(filepath),
+        }, columns=RECORD_COLUMNS).reset_index(drop=True)
+        self.profiler.add('row_extraction', filepath, time.perf_counter() - start)
+        return batch
+    
+    def clean_grade_column(self, values: pd.Series) -> pd.Series:
+        """Convert a grade column to floats, with NaN for missing or unparseable values"""
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype(float)
+        
+        # Numbers stored as objects convert directly; anything else becomes NaN
+        is_text = values.map(type) == str
+        grades = pd.to_numeric(values.where(~is_text), errors='coerce').astype(float)
+        
+        # Text grades: remove % sign and other characters, then parse
+        if is_text.any():
+            text = values[is_text].astype(str).str.replace(r'[^\d.-]', '', regex=True)
+            grades[is_text] = pd.to_numeric(text, errors='coerce').astype(float)
+        return grades
+    
+    def process_file(self, filepath: Path) -> pd.DataFrame:
+        """Extract grade records from a single file, dispatching on its extension"""
+        logger.info(f"Processing: {filepath}")
+        
+        kind = self.file_kinds.get(filepath)
+        if kind is None:
+            file_class = classify_file(filepath)
+            if file_class.rejected:
+                logger.warning(f"Skipping {filepath}: {file_class.rejected}")
+                self.failed_files.add(filepath)
+                return records_to_frame([])
+            kind = self.file_kinds[filepath] = file_class.kind
+        
+        # Route on content rather than extension, e.g. a workbook saved as .csv
+        with self.profiler.stage('file', filepath):
+            # Archive members are decompressed once and every reader works on those bytes
+            data = None
+            if filepath in self.zip_members:
+                try:
+                    data = read_source_bytes(filepath, self.zip_members)
+                except OSError as e:
+                    logger.error(f"Error reading {filepath}: {e}")
+                    self.failed_files.add(filepath)
+                    return records_to_frame([])
+            if kind in ('zip', 'ole'):
+                return self.process_excel_file(filepath, data)
+            elif kind == 'text':
+                return self.process_csv_file(filepath, data)
+            elif kind == 'pdf':
+                return self.process_pdf_file(filepath, data)
+            return records_to_frame([])
+    
+    def extract_file(self, filepath: Path) -> tuple[pd.DataFrame, bool]:
+        """process_file() plus whether extraction succeeded, i.e. did not fail with a logged error"""
+        batch = self.process_file(filepath)
+        return batch, filepath not in self.failed_files
     
     def process_all_files(self):
         """Process all files in the input directory"""
-        files = self.find_files()
+        with self.profiler.stage('discovery'):
+            files = self.find_files()
+            twins = plan_sources(files) if self.prefer_spreadsheets else {}
+            self.course_resolver.resolve_all(files)
         
-        for filepath in files:
-            logger.info(f"Processing: {filepath}")
-            
-            if filepath.suffix.lower() in ['.xlsx', '.xls']:
-                records = self.process_excel_file(filepath)
-            elif filepath.suffix.lower() == '.csv':
-                records = self.process_csv_file(filepath)
-            elif filepath.suffix.lower() == '.pdf':
-                records = self.process_pdf_file(filepath)
-            else:
-                continue
+        # Reuse records for files the manifest has already seen unchanged
+        cached: dict[Path, pd.DataFrame] = {}
+        pending = files
+        if self.manifest is not None:
+            pending = []
+            for filepath in files:
+                # Archive members have no stat of their own, so they are always parsed
+                batch = None if filepath in self.zip_members else self.manifest.lookup(filepath)
+                if batch is None:
+                    pending.append(filepath)
+                else:
+                    cached[filepath] = batch
+            logger.info(f"Manifest: reusing {len(cached)} unchanged files, {len(pending)} to parse")
+        
+        # Spreadsheets that may replace a PDF roster are extracted first, and a
+        # PDF is only dropped once one of its spreadsheets has produced records
+        extracted: dict[Path, tuple[pd.DataFrame, bool]] = {}
+        if twins:
+            candidates = {spreadsheet for spreadsheets in twins.values() for spreadsheet in spreadsheets}
+            first = [filepath for filepath in pending if filepath in candidates]
+            results = self._extract_files(first)
+            try:
+                for filepath in first:
+                    extracted[filepath] = next(results)
+            finally:
+                results.close()
             
-            self.processed_records.extend(records)
-            logger.info(f"Extracted {len(records)} grade records from {filepath}")
+            for pdf, spreadsheets in twins.items():
+                replacement = next((spreadsheet for spreadsheet in spreadsheets
+                                    if len(cached[spreadsheet] if spreadsheet in cached else extracted[spreadsheet][0])),
+                                   None)
+                if replacement is not None:
+                    self.skipped_pdfs.append((pdf, replacement))
+                    logger.info(f"Skipping PDF {pdf}: using spreadsheet {replacement} for the same class")
+            logger.info(f"Skipping {len(self.skipped_pdfs)} PDFs whose spreadsheet of the same class has records")
+            skipped = {pdf for pdf, _ in self.skipped_pdfs}
+            files = [filepath for filepath in files if filepath not in skipped]
+            pending = [filepath for filepath in pending if filepath not in skipped and filepath not in extracted]
+        
+        results = self._extract_files(pending)
+        
+        if self.jobs == 1 and self.pdf_page_jobs > 1:
+            self.page_pool = ProcessPoolExecutor(max_workers=self.pdf_page_jobs)
+        
+        export = None
+        if self.stream:
+            export = StreamingExport(self.output_dir, self.run_id)
+            logger.info(f"Streaming records to {export.data_file} and {export.sis_file}")
+        
+        try:
+            # Merge in find_files order so output matches a serial run exactly
+            for filepath in files:
+                if filepath in cached:
+                    batch = cached[filepath]
+                else:
+                    batch, succeeded = extracted.pop(filepath) if filepath in extracted else next(results)
+                    if not succeeded:
+                        self.failed_files.add(filepath)
+                    elif self.manifest is not None and filepath not in self.zip_members:
+                        # Failed files are left out so the next run retries them
+                        self.manifest.update(filepath, batch)
+                if export is not None:
+                    export.write(batch)
+                    self.running_summary.update(batch)
+                else:
+                    self.processed_records.append(batch)
+                logger.info(f"Extracted {len(batch)} grade records from {filepath}")
+            if export is not None:
+                export.commit()
+                logger.info(f"SIS-ready file: {export.sis_file} ({export.sis_records} records)")
+        finally:
+            results.close()  # Shuts the --jobs pool down now rather than at garbage collection
+            if self.page_pool is not None:
+                self.page_pool.shutdown()
+                self.page_pool = None
+            if export is not None and not export.committed:
+                for partial in export.abort():
+                    logger.warning(f"Run did not finish; records streamed so far are in {partial}")
+        
+        if self.manifest is not None:
+            self.manifest.save(files)
+    
+    def _extract_files(self, files: list[Path]) -> Iterator[tuple[pd.DataFrame, bool]]:
+        """Yield extract_file() results in the order of files, from the --jobs pool when there is one"""
+        if self.jobs > 1 and len(files) > 1:
+            yield from self._process_files_parallel(files)
+        else:
+            yield from map(self.extract_file, files)
+    
+    def _process_files_parallel(self, files: list[Path]):
+        """Yield (record batch, succeeded) per file from a process pool, in the order of files"""
+        # Small chunks keep workers balanced when a few large files dominate
+        chunksize = max(1, min(16, len(files) // (self.jobs * 8)))
+        executor = ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_worker,
+            initargs=(self, logging.getLogger().level),
+        )
+        try:
+            for batch, succeeded, samples in executor.map(_process_file_in_worker, files, chunksize=chunksize):
+                self.profiler.merge(samples)
+                yield batch, succeeded
+        finally:
+            # If the consumer failed or stopped early, drop the queued files
+            # instead of waiting for all of them before the error surfaces
+            executor.shutdown(cancel_futures=True)
     
     def generate_reports(self):
         """Generate summary reports and export data"""
+        if self.running_summary is not None:
+            # Streaming runs have already written the data exports
+            if not self.running_summary.total_records:
+                logger.warning("No records processed")
+                return
+            self.write_reports([self.summary_report_job(
+                self.running_summary.summary(),
+                self.running_summary.course_breakdown(),
+                self.running_summary.file_breakdown(),
+            )])
+            return
+        
         if not self.processed_records:
             logger.warning("No records processed")
             return
         
-        # Convert to DataFrame
-        df = pd.DataFrame([
-            {
-                'Student_ID': r.student_id,
-                'Student_Name': r.student_name,
-                'Course_Code': r.course_code,
-                'Grade': r.grade,
-                'Term': r.term,
-                'Source_File': r.file_source
-            }
-            for r in self.processed_records
-        ])
-        
-        # Export main data
-        output_file = self.output_dir / f"processed_grades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        df.to_excel(output_file, index=False)
-        logger.info(f"Exported {len(df)} records to {output_file}")
+        df = self.processed_records.to_frame()
         
         # Generate summary report
         summary = {
             'Total Records': len(df),
             'Unique Courses': df['Course_Code'].nunique(),
             'Unique Terms': df['Term'].nunique(),
-            'Files Processed': df['Source_File'].nunique(),
+            'Files Processed': df['Source_File'].str.partition(SHEET_SOURCE_SEPARATOR)[0].nunique(),
             'Records Missing Student ID': len(df[df['Student_ID'] == '']),
             'Records Missing Student Name': len(df[df['Student_Name'] == '']),
         }
         
+        # Course breakdown
+        course_summary = df.groupby(['Course_Code', 'Term']).agg({
+            'Grade': ['count', 'mean', 'min', 'max'],
+            'Source_File': 'nunique'
+        }).round(2)
+        
+        # Files processed
+        file_summary = df.groupby('Source_File').agg({
+            'Grade': 'count',
+            'Course_Code': 'first',
+            'Term': 'first'
+        })
+        
+        output_file = self.output_dir / f"processed_grades_{self.run_id}.{self.output_format}"
+        sis_file = self.output_dir / f"sis_import_ready_{self.run_id}.csv"
+        sis_records = int((df['Student_ID'] != '').sum())
+        
+        self.write_reports([
+            (output_file, write_records, (df, self.output_format),
+             f"Exported {len(df)} records to {output_file}"),
+            self.summary_report_job(summary, course_summary, file_summary),
+            # Export for SIS import (clean format)
+            (sis_file, write_sis_csv, (df,), f"SIS-ready file: {sis_file} ({sis_records} records)"),
+        ])
+    
+    def summary_report_job(self, summary: dict, course_summary: pd.DataFrame, file_summary: pd.DataFrame) -> tuple:
+        """Writer job for the three-sheet processing summary workbook"""
+        if self.prefer_spreadsheets:
+            summary = {**summary, 'PDFs Skipped (Spreadsheet Available)': len(self.skipped_pdfs)}
+        if self.zip_members or self.already_extracted:
+            summary = {**summary,
+                       'Files Read From Zip Archives': len(self.zip_members),
+                       'Zip Members Skipped (Already Extracted)': len(self.already_extracted)}
+        summary = {**summary, 'Files Rejected Before Parsing': len(self.rejected_files)}
+        for reason, count in Counter(reason for _, reason in self.rejected_files).most_common():
+            summary[f"Files Rejected ({reason})"] = count
         summary_df = pd.DataFrame(list(summary.items()), columns=['Metric', 'Value'])
-        summary_file = self.output_dir / f"processing_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        summary_file = self.output_dir / f"processing_summary_{self.run_id}.xlsx"
+        return (summary_file, write_summary_workbook, (summary_df, course_summary, file_summary),
+                f"Generated summary report: {summary_file}")
+    
+    def write_reports(self, jobs: list[tuple]):
+        """Run (path, writer, args, message) jobs, each written atomically
         
-        with pd.ExcelWriter(summary_file) as writer:
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Course breakdown
-            course_summary = df.groupby(['Course_Code', 'Term']).agg({
-                'Grade': ['count', 'mean', 'min', 'max'],
-                'Source_File': 'nunique'
-            }).round(2)
-            course_summary.to_excel(writer, sheet_name='Course_Breakdown')
-            
-            # Files processed
-            file_summary = df.groupby('Source_File').agg({
-                'Grade': 'count',
-                'Course_Code': 'first',
-                'Term': 'first'
-            })
-            file_summary.to_excel(writer, sheet_name='Files_Processed')
-        
-        logger.info(f"Generated summary report: {summary_file}")
-        
-        # Export for SIS import (clean format)
-        sis_df = df[df['Student_ID'] != ''].copy()  # Only records with student IDs
-        sis_file = self.output_dir / f"sis_import_ready_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        sis_df.to_csv(sis_file, index=False)
-        logger.info(f"SIS-ready file: {sis_file} ({len(sis_df)} records)")
+        Several jobs are written concurrently in separate processes (the
+        writers are CPU-bound), so the wall time is that of the slowest one.
+        """
+        if len(jobs) == 1:
+            path, writer, args, message = jobs[0]
+            with self.profiler.stage('report_writing'):
+                write_atomic(path, writer, *args)
+            logger.info(message)
+            return
+        
+        with self.profiler.stage('report_writing'), ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [executor.submit(write_atomic, path, writer, *args) for path, writer, args, _ in jobs]
+            for future, (_, _, _, message) in zip(futures, jobs):
+                future.result()
+                logger.info(message)
+    
+    def write_profile(self) -> Path:
+        """Write the --profile report: a JSON summary and a CSV of every per-file stage timing"""
+        report = self.profiler.report(self.run_id)
+        json_file = self.output_dir / f"profile_{self.run_id}.json"
+        csv_file = self.output_dir / f"profile_{self.run_id}.csv"
+        write_atomic(json_file, lambda path: path.write_text(json.dumps(report, indent=2), encoding='utf-8'))
+        write_atomic(csv_file, lambda path: self.profiler.to_frame().to_csv(path, index=False))
+        
+        for stage, stats in sorted(report['stages'].items(), key=lambda item: -item[1]['total_seconds']):
+            logger.info(f"Profile {stage:<17} total {stats['total_seconds']:>9.3f}s  "
+                        f"p50 {stats['p50']:.4f}s  p99 {stats['p99']:.4f}s  n={stats['count']}")
+        logger.info(f"Profile report: {json_file}")
+        return json_file
+
+# Processor instance owned by each --jobs worker process
+_worker_processor: GradeProcessor | None = None
+
+def _init_worker(processor: GradeProcessor, log_level: int):
+    """Process pool initializer: keep a private copy of the processor"""
+    global _worker_processor
+    logging.getLogger().setLevel(log_level)
+    # With the fork start method the processor is inherited rather than
+    # pickled, so drop any timings the parent had collected before the pool
+    processor.profiler.drain()
+    _worker_processor = processor
+
+def _process_file_in_worker(filepath: Path) -> tuple[pd.DataFrame, bool, list]:
+    batch, succeeded = _worker_processor.extract_file(filepath)
+    return batch, succeeded, _worker_processor.profiler.drain()
 
 def main():
     """Main execution function"""
@@ -390,18 +1523,59 @@ def main():
     parser.add_argument('input_dir', help='Directory containing grade files')
     parser.add_argument('output_dir', help='Directory for processed output')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of worker processes used to extract files in parallel (default: 1)')
+    parser.add_argument('--manifest', metavar='PATH',
+                        help='Manifest file used to skip files unchanged since the previous run')
+    parser.add_argument('--stream', action='store_true',
+                        help='Append records to the CSV exports as each file is processed, keeping only summary aggregates in memory')
+    parser.add_argument('--pdf-cache', metavar='DIR',
+                        help='Directory for a persistent cache of extracted PDF text, keyed by content hash')
+    parser.add_argument('--pdf-page-jobs', type=int, default=1,
+                        help='Worker processes for page-level PDF text extraction when --jobs is 1 (default: 1)')
+    parser.add_argument('--all-sources', action='store_true',
+                        help='Also parse PDFs of classes that have a spreadsheet in the same folder')
+    parser.add_argument('--format', choices=list(EXPORT_WRITERS), dest='output_format',
+                        help='Format of the processed_grades export (default: xlsx, or csv with --stream); '
+                             'parquet is partitioned by Term and Course_Code')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time each processing stage per file and write profile_<run>.json/.csv to the output directory')
+    parser.add_argument('--excel-engine', choices=['auto', *EXCEL_READERS], default='auto',
+                        help="Excel reader backend; 'auto' uses calamine when installed, otherwise openpyxl")
     
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.pdf_page_jobs < 1:
+        parser.error('--pdf-page-jobs must be at least 1')
+    
+    if args.excel_engine != 'auto' and not excel_engine_available(args.excel_engine):
+        parser.error(f"--excel-engine {args.excel_engine} is not installed")
+    
+    if args.output_format is None:
+        args.output_format = 'csv' if args.stream else 'xlsx'
+    if args.stream and args.output_format != 'csv':
+        parser.error('--stream only supports --format csv')
+    if not export_format_available(args.output_format):
+        parser.error(f"--format {args.output_format} requires pyarrow (pip install clean-grades-for-import[parquet])")
+    
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    processor = GradeProcessor(args.input_dir, args.output_dir)
+    processor = GradeProcessor(args.input_dir, args.output_dir, jobs=args.jobs,
+                               manifest_path=args.manifest, stream=args.stream,
+                               excel_engine=args.excel_engine, pdf_cache_dir=args.pdf_cache,
+                               pdf_page_jobs=args.pdf_page_jobs,
+                               prefer_spreadsheets=not args.all_sources,
+                               output_format=args.output_format, profile=args.profile)
     processor.process_all_files()
     processor.generate_reports()
+    if args.profile:
+        processor.write_profile()
     
     print("\nProcessing complete!")
-    print(f"Total records processed: {len(processor.processed_records)}")
+    print(f"Total records processed: {processor.record_count}")
     print(f"Output saved to: {args.output_dir}")
 
 if __name__ == "__main__":
@@ -1,3 +1,10 @@
+"""
+Convert every worksheet of the .xlsx files under a directory to its own CSV.
+
+main.py already extracts all grade-bearing sheets of a workbook from a single
+read, so this is only needed when per-sheet CSV exports are wanted.
+"""
+
 import pandas as pd
 from pathlib import Path
 import argparse